@@ -1,23 +1,24 @@
 from django.contrib import admin
+from django.utils import timezone
 
-from .models import Category, Tag, Post, Comment
+from .models import Category, Tag, Post, Comment, Task
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ("name", "slug")
+    list_display = ("name", "slug", "published_post_count")
     prepopulated_fields = {"slug": ("name",)}
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ("name", "slug")
+    list_display = ("name", "slug", "published_post_count")
     prepopulated_fields = {"slug": ("name",)}
 
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ("title", "author", "status", "publish_date")
+    list_display = ("title", "author", "status", "publish_date", "comment_count")
     list_filter = ("status", "publish_date", "category", "tags")
     search_fields = ("title", "content")
     prepopulated_fields = {"slug": ("title",)}
@@ -31,3 +32,15 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ("post", "author", "created_at", "active")
     list_filter = ("active", "created_at")
     search_fields = ("content",)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "queue", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "queue", "name")
+    readonly_fields = ("created_at", "finished_at", "locked_at", "last_error")
+    actions = ["retry"]
+
+    @admin.action(description="Retry selected tasks")
+    def retry(self, request, queryset):
+        queryset.update(status="queued", attempts=0, run_at=timezone.now(), locked_at=None)
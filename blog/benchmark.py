@@ -0,0 +1,272 @@
+"""Latency and query-count benchmark for the blog views.
+
+Requests go through the whole Django stack (middleware, views, templates) with
+the test client, against whatever the configured database holds; load data with
+``manage.py generate_fake_data`` first. Each scenario requests every sample
+path once to warm up and count queries, then times ``iterations`` requests
+round-robin over the paths. ``run_benchmark`` returns plain dicts so
+``manage.py benchmark --json`` can save a run and ``--compare`` can diff two of
+them, e.g. before and after a commit.
+
+The full-page cache is disabled unless asked for, so the numbers measure the
+views rather than cache hits.
+
+With ``concurrency`` above 1 the timed requests are spread over that many
+clients in parallel and the results include throughput (``rps``). ``asgi``
+sends them through Django's ASGI handler with ``AsyncClient`` instead of
+threads over the WSGI handler; run it with ``BLOG_ASYNC_VIEWS=True`` so the
+async views are routed. ``db_latency`` adds a sleep to every query, standing in
+for the network round trip to a remote database, which is where overlapping
+requests pays off.
+
+``render`` is the median template render time, read from the ``Server-Timing``
+header that ``blog.timing`` adds; run with ``BLOG_CACHED_TEMPLATES=False`` to
+see what the cached template loader saves.
+"""
+import asyncio
+import random
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .counters import published_posts
+from .fakedata import WORDS
+from .models import Category, Tag
+from .pagination import CursorPaginator
+
+PERCENTILES = (50, 90, 99)
+
+_RENDER_RE = re.compile(r"\btpl;dur=([\d.]+)")
+
+
+def _sample_posts(size: int, rng):
+    posts = published_posts()
+    max_pk = posts.aggregate(top=Max("pk"))["top"] or 0
+    pks = rng.sample(range(1, max_pk + 1), min(size * 5, max_pk))
+    return list(posts.filter(pk__in=pks).values_list("slug", flat=True)[:size])
+
+
+def _middle_cursor():
+    """A cursor into the middle of the post list, for deep-pagination timings."""
+    posts = published_posts().order_by("-publish_date", "-pk")
+    total = posts.count()
+    if not total:
+        return None
+    values = posts.values_list("publish_date", "pk")[total // 2]
+    return CursorPaginator(posts, 10).encode_cursor(values, "next")
+
+
+def build_scenarios(sample: int = 20, seed: int = 0) -> dict:
+    """Map scenario names to ``(paths, user)``; ``user`` is logged in if set."""
+    rng = random.Random(seed)
+    post_list = reverse("blog:post_list")
+    scenarios = {"post_list": ([post_list], None)}
+    cursor = _middle_cursor()
+    if cursor:
+        scenarios["post_list_deep"] = ([f"{post_list}?cursor={cursor}"], None)
+    slugs = _sample_posts(sample, rng)
+    if slugs:
+        scenarios["post_detail"] = (
+            [reverse("blog:post_detail", kwargs={"slug": slug}) for slug in slugs],
+            None,
+        )
+    words = rng.sample(WORDS, min(sample, len(WORDS)))
+    scenarios["search"] = ([f"{post_list}?q={word}" for word in words], None)
+    category = Category.objects.order_by("-published_post_count").first()
+    if category:
+        scenarios["category"] = (
+            [reverse("blog:category_posts", kwargs={"slug": category.slug})],
+            None,
+        )
+    tag = Tag.objects.order_by("-published_post_count").first()
+    if tag:
+        scenarios["tag"] = ([reverse("blog:tag_posts", kwargs={"slug": tag.slug})], None)
+    staff = User.objects.filter(is_staff=True).order_by("pk").first()
+    if staff:
+        scenarios["dashboard"] = ([reverse("blog:dashboard")], staff)
+    return scenarios
+
+
+def _percentile(timings, percent: int) -> float:
+    if len(timings) < 2:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method="inclusive")[percent - 1]
+
+
+@contextmanager
+def simulated_db_latency(seconds: float):
+    """Sleep ``seconds`` before every query, on every connection opened meanwhile."""
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    existing = connections.all(initialized_only=True)
+    for conn in existing:
+        conn.execute_wrappers.append(delay)
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for conn in existing:
+            conn.execute_wrappers.remove(delay)
+
+
+def _render_time(response):
+    """Template render time reported by ``blog.timing`` in ``Server-Timing``, if any."""
+    match = _RENDER_RE.search(response.headers.get("Server-Timing", ""))
+    return float(match[1]) if match else None
+
+
+def _shares(iterations: int, concurrency: int) -> list:
+    return [iterations // concurrency + (n < iterations % concurrency) for n in range(concurrency)]
+
+
+def _time_wsgi(paths, iterations, concurrency, cookies) -> list:
+    def worker(offset, count):
+        client = Client()
+        client.cookies.update(cookies)
+        timings = []
+        try:
+            for n in range(offset, offset + count):
+                started = time.perf_counter()
+                response = client.get(paths[n % len(paths)], secure=True)
+                timings.append(((time.perf_counter() - started) * 1000, _render_time(response)))
+        finally:
+            if concurrency > 1:
+                connections.close_all()
+        return timings
+
+    if concurrency == 1:
+        return worker(0, iterations)
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = [pool.submit(worker, n, count) for n, count in enumerate(_shares(iterations, concurrency))]
+        return [timing for future in futures for timing in future.result()]
+
+
+async def _time_asgi(paths, iterations, concurrency, cookies) -> list:
+    timings = []
+
+    async def worker(offset, count):
+        client = AsyncClient()
+        client.cookies.update(cookies)
+        for n in range(offset, offset + count):
+            started = time.perf_counter()
+            # As in ASGIHandler: each request's sync code gets a thread of its own.
+            async with ThreadSensitiveContext():
+                response = await client.get(paths[n % len(paths)], secure=True)
+            timings.append(((time.perf_counter() - started) * 1000, _render_time(response)))
+
+    await asyncio.gather(
+        *(worker(n, count) for n, count in enumerate(_shares(iterations, concurrency)))
+    )
+    return timings
+
+
+def run_scenario(paths, user=None, iterations: int = 20, concurrency: int = 1, asgi=False) -> dict:
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    queries, statuses = 0, set()
+    for path in paths:
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(path, secure=True)
+        queries = max(queries, len(captured))
+        statuses.add(response.status_code)
+
+    started = time.perf_counter()
+    if asgi:
+        timings = asyncio.run(_time_asgi(paths, iterations, concurrency, client.cookies))
+    else:
+        timings = _time_wsgi(paths, iterations, concurrency, client.cookies)
+    elapsed = time.perf_counter() - started
+    renders = [render for _, render in timings if render is not None]
+    timings = [timing for timing, _ in timings]
+    result = {f"p{percent}": round(_percentile(timings, percent), 2) for percent in PERCENTILES}
+    result.update(
+        mean=round(statistics.fmean(timings), 2),
+        max=round(max(timings), 2),
+        render=round(statistics.median(renders), 2) if renders else None,
+        rps=round(iterations / elapsed, 1),
+        queries=queries,
+        status=sorted(statuses),
+    )
+    return result
+
+
+def run_benchmark(
+    iterations: int = 20,
+    sample: int = 20,
+    only=None,
+    page_cache=False,
+    seed=0,
+    concurrency: int = 1,
+    asgi=False,
+    db_latency: float = 0,
+) -> dict:
+    """Run every scenario (or those named in ``only``). Latencies are in milliseconds.
+
+    ``db_latency`` is in milliseconds too.
+    """
+    # Server-Timing carries the render time; slow requests are reported in the
+    # results rather than logged one by one.
+    overrides = {
+        "ALLOWED_HOSTS": ["testserver"],
+        "BLOG_SERVER_TIMING": True,
+        "BLOG_SLOW_REQUEST_MS": float("inf"),
+    }
+    if not page_cache:
+        overrides["BLOG_PAGE_CACHE_TIMEOUT"] = 0
+    with override_settings(**overrides), simulated_db_latency(db_latency / 1000):
+        scenarios = build_scenarios(sample=sample, seed=seed)
+        results = {
+            name: run_scenario(paths, user, iterations=iterations, concurrency=concurrency, asgi=asgi)
+            for name, (paths, user) in scenarios.items()
+            if not only or name in only
+        }
+    return {
+        "meta": {
+            "vendor": connection.vendor,
+            "posts": published_posts().count(),
+            "iterations": iterations,
+            "page_cache": page_cache,
+            "handler": "asgi" if asgi else "wsgi",
+            "async_views": settings.BLOG_ASYNC_VIEWS,
+            "concurrency": concurrency,
+            "db_latency": db_latency,
+            "cached_templates": settings.BLOG_CACHED_TEMPLATES,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> list:
+    """Rows of ``(scenario, metric, before, after, change %)`` for two runs."""
+    rows = []
+    for name, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        for metric in [f"p{percent}" for percent in PERCENTILES] + ["render", "rps", "queries"]:
+            if before.get(metric) is None or after.get(metric) is None:
+                continue
+            old, new = before[metric], after[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            rows.append((name, metric, old, new, round(change, 1)))
+    return rows
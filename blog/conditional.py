@@ -0,0 +1,92 @@
+"""Conditional GET (ETag / Last-Modified) for anonymous readers.
+
+Views implement ``get_validators()`` with one cheap metadata query (the post's
+``updated_at`` and newest comment, or ``MAX(updated_at)`` of a listing) and
+``ConditionalGetMixin`` answers a matching ``If-None-Match`` or
+``If-Modified-Since`` with 304 before the page's queryset is evaluated or its
+template rendered. Fresh responses carry the validators plus
+``Cache-Control: no-cache``, so browsers and crawlers revalidate instead of
+guessing a freshness lifetime from ``Last-Modified``.
+
+``updated_at`` alone misses posts leaving a listing, comments and sidebar
+changes, so ETags also cover the page's page-cache dependency tokens (see
+``blog.pagecache``), which the signals replace on exactly those writes. A lost
+token only costs a full response. ``pagecache.purge_all()`` invalidates every
+ETag too, and each ETag includes ``BLOG_BUILD_ID``, so a deploy that changes
+templates does not leave readers revalidating the old HTML.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import pagecache
+
+
+def page_etag(dependencies, *parts) -> str:
+    """An ETag for a page showing ``parts`` and depending on ``dependencies``."""
+    tokens = pagecache.current_tokens([pagecache.SITE_DEPENDENCY, *dependencies])
+    values = [pagecache.build_id()] + [tokens[dep] for dep in sorted(tokens)]
+    values += [str(part) for part in parts]
+    digest = hashlib.md5("|".join(values).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def set_validators(response, etag, last_modified) -> None:
+    if not response.has_header("ETag"):
+        response.headers["ETag"] = etag
+    if last_modified and not response.has_header("Last-Modified"):
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, no_cache=True)
+
+
+class ConditionalGetMixin:
+    """Answer unchanged anonymous GETs with 304 Not Modified."""
+
+    def get_validators(self):
+        """Return ``(etag, last_modified)`` for the page, or ``None`` to skip.
+
+        Called before the view runs, so it can only use ``self.kwargs`` and the
+        request.
+        """
+        raise NotImplementedError
+
+    async def aget_validators(self):
+        """``get_validators()`` for async views; override to use the async ORM."""
+        return await sync_to_async(self.get_validators)()
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch_conditional(request, *args, **kwargs)
+        if not pagecache.is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+        validators = self.get_validators()
+        if validators is None:
+            return super().dispatch(request, *args, **kwargs)
+        response = self.conditional_response(request, validators)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        return self.finish_response(response, validators)
+
+    async def adispatch_conditional(self, request, *args, **kwargs):
+        if not await pagecache.ais_cacheable_request(request):
+            return await super().dispatch(request, *args, **kwargs)
+        validators = await self.aget_validators()
+        if validators is None:
+            return await super().dispatch(request, *args, **kwargs)
+        response = self.conditional_response(request, validators)
+        if response is None:
+            response = await super().dispatch(request, *args, **kwargs)
+        return self.finish_response(response, validators)
+
+    def conditional_response(self, request, validators):
+        """A 304 (or 412) answer to ``request``, or ``None`` to render the page."""
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def finish_response(self, response, validators):
+        if response.status_code in (200, 304):
+            set_validators(response, *validators)
+        return response
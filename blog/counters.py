@@ -0,0 +1,66 @@
+"""Denormalized counters: published posts per ``Category`` and ``Tag``, and
+active comments per ``Post``.
+
+Counts are recomputed with a single ``UPDATE ... SET count = (subquery)`` for
+just the rows a write touched, so concurrent writers can never leave a counter
+off by one the way ``F("count") + 1`` bookkeeping can. ``recount_all`` (and the
+``recount`` management command) repairs any drift.
+"""
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Category, Comment, Post, Tag
+
+
+def published_posts():
+    return Post.objects.filter(status="published")
+
+
+def counts_as_published(status: str) -> bool:
+    return status == "published"
+
+
+def is_counted(post) -> bool:
+    """Whether ``post`` currently contributes to the counters."""
+    return counts_as_published(post.status)
+
+
+def _count_subquery(queryset, group_field: str):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{group_field: OuterRef("pk")})
+            .order_by()
+            .values(group_field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def recount_categories(category_ids=None) -> int:
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=[pk for pk in category_ids if pk])
+    return categories.update(
+        published_post_count=_count_subquery(published_posts(), "category")
+    )
+
+
+def recount_tags(tag_ids=None) -> int:
+    tags = Tag.objects.all()
+    if tag_ids is not None:
+        tags = tags.filter(pk__in=tag_ids)
+    post_tags = Post.tags.through.objects.filter(post__status="published")
+    return tags.update(published_post_count=_count_subquery(post_tags, "tag"))
+
+
+def recount_comments(post_ids=None) -> int:
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=[pk for pk in post_ids if pk])
+    return posts.update(comment_count=_count_subquery(Comment.objects.filter(active=True), "post"))
+
+
+def recount_all() -> tuple[int, int, int]:
+    return recount_categories(), recount_tags(), recount_comments()
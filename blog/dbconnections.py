@@ -0,0 +1,88 @@
+"""Database connection health and reuse metrics.
+
+Connections are configured in ``blogmota/settings.py``: a psycopg pool per
+process on PostgreSQL, persistent connections with ``CONN_HEALTH_CHECKS``
+elsewhere, WAL mode on SQLite. This module counts, per process, how many
+requests were served and how many database connections had to be opened for
+them; a falling ``requests_per_connection`` means connections are being dropped
+(dead connections, a pool that is too small, ``CONN_MAX_AGE=0``). Pooled
+aliases report the pool's own counters as well.
+
+``check_databases()`` backs the ``/healthz/`` endpoint: it runs ``SELECT 1`` on
+every database and returns the metrics alongside.
+"""
+import logging
+import threading
+from collections import Counter
+
+from django.core.signals import request_started
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_opened = Counter()
+_requests = 0
+
+
+@receiver(connection_created, dispatch_uid="blog.dbconnections.count_connection")
+def count_connection(sender, connection, **kwargs):
+    # With a pool this fires on every checkout; the pool counts real connects.
+    with _lock:
+        _opened[connection.alias] += 1
+
+
+@receiver(request_started, dispatch_uid="blog.dbconnections.count_request")
+def count_request(sender, **kwargs):
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+def reset_stats() -> None:
+    global _requests
+    with _lock:
+        _opened.clear()
+        _requests = 0
+
+
+def connection_stats() -> dict:
+    """Connection metrics of this process, keyed by database alias."""
+    with _lock:
+        requests = _requests
+        opened = dict(_opened)
+    stats = {}
+    for connection in connections.all():
+        pool = getattr(connection, "pool", None)
+        entry = {"vendor": connection.vendor, "pooled": pool is not None, "requests": requests}
+        if pool is not None:
+            entry["pool"] = pool.get_stats()
+            entry["opened"] = entry["pool"].get("connections_num", 0)
+        else:
+            entry["opened"] = opened.get(connection.alias, 0)
+        entry["requests_per_connection"] = (
+            round(requests / entry["opened"], 1) if entry["opened"] else None
+        )
+        stats[connection.alias] = entry
+    return stats
+
+
+def check_databases():
+    """Return ``(ok, stats)`` after running a trivial query on every database."""
+    ok = True
+    stats = connection_stats()
+    for connection in connections.all():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+        except DatabaseError:
+            logger.exception("Health check failed for database %r", connection.alias)
+            # Do not hand the broken connection to the next request.
+            connection.close()
+            stats[connection.alias]["ok"] = ok = False
+        else:
+            stats[connection.alias]["ok"] = True
+    return ok, stats
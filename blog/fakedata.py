@@ -0,0 +1,134 @@
+"""Synthetic blog content for load testing.
+
+``generate_records`` yields archive records (see ``blog.transfer``) for any
+number of posts, so large data sets load through the same batched importer as
+real archives. Content is determined by the seed (dates are relative to now),
+and post ``n`` always gets the same slug, so generating 100k posts on top of an
+existing 10k just adds the missing 90k.
+
+Bodies are CKEditor-style HTML (headings, paragraphs with inline markup, lists
+and the odd image) built from a fixed vocabulary, so search, excerpts and the
+related-posts engine have realistic term distributions to work with.
+"""
+import random
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.text import slugify
+
+WORDS = """
+    account adventure algorithm analysis answer archive article balance battery
+    beginner benchmark breakfast budget cache camera career checklist chicken
+    climate cloud coffee community compiler concert container cooking culture
+    database debugging deployment design desert diary django editor energy engine
+    festival fitness framework garden guide habit harbour health history holiday
+    interface island journey kitchen language library lifestyle market memory
+    method migration mountain museum network notebook ocean package painting
+    pattern pipeline planning podcast portfolio practice project python query
+    recipe release research river routine runtime schedule science server
+    session shortcut spice startup station storage strategy student summer
+    syntax teaching template testing theory travel tutorial update upgrade
+    valley village weather weekend window winter workflow workshop writing
+""".split()
+CATEGORY_NAMES = [
+    "Technology", "Travel", "Food & Cooking", "Lifestyle", "Programming", "Science",
+    "Health", "Finance", "Books", "Music", "Photography", "Education",
+]
+# Share of posts that are drafts / scheduled in the future.
+DRAFT_SHARE = 0.05
+SCHEDULED_SHARE = 0.01
+
+
+def _sentence(rng, low=6, high=18) -> str:
+    words = rng.choices(WORDS, k=rng.randint(low, high))
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng) -> str:
+    sentences = [_sentence(rng) for _ in range(rng.randint(2, 6))]
+    if rng.random() < 0.3:
+        index = rng.randrange(len(sentences))
+        sentences[index] = f"<strong>{sentences[index]}</strong>"
+    if rng.random() < 0.2:
+        word = rng.choice(WORDS)
+        sentences.append(f'<a href="https://example.com/{word}">Read more about {word}</a>.')
+    return f"<p>{' '.join(sentences)}</p>"
+
+
+def _pick_tag(rng, tag_slugs) -> str:
+    # Tag popularity follows a long tail, like on real blogs.
+    index = int(rng.expovariate(8 / len(tag_slugs)))
+    return tag_slugs[min(index, len(tag_slugs) - 1)]
+
+
+def make_body(rng, sections: int = 4) -> str:
+    parts = []
+    for _ in range(rng.randint(2, sections + 2)):
+        parts.append(f"<h3>{_sentence(rng, 2, 5)[:-1]}</h3>")
+        parts.extend(_paragraph(rng) for _ in range(rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            items = "".join(f"<li>{_sentence(rng, 2, 6)}</li>" for _ in range(rng.randint(3, 6)))
+            parts.append(f"<ul>{items}</ul>")
+        if rng.random() < 0.1:
+            parts.append(f'<p><img alt="{rng.choice(WORDS)}" src="/media/uploads/sample.jpg"></p>')
+    return "".join(parts)
+
+
+def generate_records(
+    posts: int, users: int = 50, categories: int = 12, tags: int = 200, comments: int = 3, seed: int = 0
+):
+    """Yield users, categories, tags, then ``posts`` posts with about ``comments`` comments each."""
+    rng = random.Random(seed)
+    usernames = [f"user{n}" for n in range(users)]
+    for n, username in enumerate(usernames):
+        yield {
+            "type": "user",
+            "username": username,
+            "email": f"{username}@example.com",
+            "is_staff": n == 0,
+        }
+
+    category_slugs = []
+    for n in range(categories):
+        name = CATEGORY_NAMES[n] if n < len(CATEGORY_NAMES) else f"Category {n}"
+        category_slugs.append(slugify(name))
+        yield {"type": "category", "name": name, "slug": slugify(name), "description": _sentence(rng)}
+
+    tag_slugs = []
+    for n in range(tags):
+        name = WORDS[n].capitalize() if n < len(WORDS) else f"{WORDS[n % len(WORDS)]}-{n}"
+        tag_slugs.append(slugify(name))
+        yield {"type": "tag", "name": name, "slug": slugify(name)}
+
+    now = timezone.now().replace(microsecond=0)
+    for n in range(posts):
+        title = _sentence(rng, 3, 8)[:-1]
+        roll = rng.random()
+        status = "draft" if roll < DRAFT_SHARE else "published"
+        if roll > 1 - SCHEDULED_SHARE:
+            publish_date = now + timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+        else:
+            publish_date = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 3))
+        post_tags = {_pick_tag(rng, tag_slugs) for _ in range(rng.randint(0, 5))} if tag_slugs else set()
+        post_comments = []
+        if status == "published":
+            post_comments = [
+                {
+                    "author": rng.choice(usernames),
+                    "content": _sentence(rng),
+                    "active": rng.random() > 0.05,
+                }
+                for _ in range(rng.randint(0, comments * 2))
+            ]
+        yield {
+            "type": "post",
+            "title": title,
+            "slug": f"{slugify(title)[:200]}-{n}",
+            "author": rng.choice(usernames),
+            "category": rng.choice(category_slugs) if category_slugs else None,
+            "tags": sorted(post_tags),
+            "content": make_body(rng),
+            "status": status,
+            "publish_date": publish_date.isoformat(),
+            "comments": post_comments,
+        }
@@ -1,6 +1,7 @@
 from django import forms
+from django.contrib.auth.models import User
 
-from .models import Post, Comment
+from .models import Category, Post, Comment
 
 
 class PostForm(forms.ModelForm):
@@ -24,3 +25,44 @@ class CommentForm(forms.ModelForm):
         widgets = {
             "content": forms.Textarea(attrs={"rows": 3}),
         }
+
+
+class DashboardFilterForm(forms.Form):
+    STATUS_CHOICES = [
+        ("", "All"),
+        ("published", "Published"),
+        ("scheduled", "Scheduled"),
+        ("draft", "Draft"),
+    ]
+    SORT_CHOICES = [
+        ("-publish_date", "Newest first"),
+        ("publish_date", "Oldest first"),
+        ("title", "Title A-Z"),
+        ("-title", "Title Z-A"),
+        ("-comment_count", "Most comments"),
+        ("author__username", "Author"),
+    ]
+
+    status = forms.ChoiceField(choices=STATUS_CHOICES, required=False)
+    author = forms.ModelChoiceField(queryset=User.objects.none(), required=False, empty_label="All")
+    category = forms.ModelChoiceField(
+        queryset=Category.objects.only("pk", "name"), required=False, empty_label="All"
+    )
+    date_from = forms.DateField(
+        required=False, label="From", widget=forms.DateInput(attrs={"type": "date"})
+    )
+    date_to = forms.DateField(required=False, label="To", widget=forms.DateInput(attrs={"type": "date"}))
+    sort = forms.ChoiceField(choices=SORT_CHOICES, required=False)
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None and user.is_staff:
+            self.fields["author"].queryset = User.objects.filter(
+                pk__in=Post.objects.values("author_id")
+            ).only("pk", "username").order_by("username")
+        else:
+            # Authors only ever see their own posts.
+            del self.fields["author"]
+        for name, field in self.fields.items():
+            css_class = "form-control" if name.startswith("date_") else "form-select"
+            field.widget.attrs["class"] = f"{css_class} {css_class}-sm"
@@ -0,0 +1,196 @@
+"""Responsive image derivatives for featured images and CKEditor uploads.
+
+For every source image a post uses, resized copies are written next to the
+original (``posts/photo.png`` -> ``posts/photo-640w.webp``) in each supported
+format. What was generated is recorded on ``Post.image_variants``::
+
+    {"posts/photo.png": {"width": 2048, "height": 1536,
+                         "variants": {"webp": [[320, "posts/photo-320w.webp"], ...],
+                                      "jpeg": [...]}}}
+
+so templates and ``blog.richtext`` can emit ``srcset`` without touching the
+storage; a post's ``content_html`` is re-rendered once its manifest changes.
+Generation runs outside the request: saving a post only queues
+``blog.tasks.process_post_images`` on the ``media`` queue, which a worker on
+the machine holding ``MEDIA_ROOT`` runs (``start.sh``).
+"""
+import logging
+import os
+import re
+from io import BytesIO
+from urllib.parse import unquote, urlsplit
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 1024, 1600)
+# Preferred first; the last one is the <img> fallback every browser can show.
+FORMATS = tuple(
+    fmt for fmt in ("avif", "webp", "jpeg") if fmt == "jpeg" or features.check(fmt)
+)
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+SAVE_OPTIONS = {
+    "avif": {"format": "AVIF", "quality": 50},
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+_IMG_SRC_RE = re.compile(r"<img\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+
+
+def derivative_name(name: str, width: int, fmt: str) -> str:
+    stem, _ = os.path.splitext(name)
+    return f"{stem}-{width}w.{EXTENSIONS[fmt]}"
+
+
+def storage_name_from_url(url: str, storage=default_storage):
+    """Map a ``MEDIA_URL`` image URL back to its storage name, or ``None``."""
+    path = unquote(urlsplit(url).path)
+    base = urlsplit(storage.base_url).path
+    if not path.startswith(base):
+        return None
+    return path[len(base) :]
+
+
+def content_image_names(html: str, storage=default_storage) -> list:
+    names = []
+    for src in _IMG_SRC_RE.findall(html or ""):
+        name = storage_name_from_url(src, storage)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def source_image_names(post) -> list:
+    names = [post.featured_image.name] if post.featured_image else []
+    return names + [name for name in content_image_names(post.content) if name not in names]
+
+
+def _prepare(image: Image.Image, fmt: str) -> Image.Image:
+    if fmt == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode not in ("RGB", "RGBA"):
+        return image.convert("RGBA")
+    return image
+
+
+def generate_derivatives(name: str, storage=default_storage) -> dict:
+    """Write the resized copies of ``name`` and return its manifest entry."""
+    with storage.open(name, "rb") as source:
+        original = Image.open(source)
+        original.load()
+    width, height = original.size
+    targets = sorted({w for w in WIDTHS if w < width} | {min(width, WIDTHS[-1])})
+    variants = {fmt: [] for fmt in FORMATS}
+    for target in targets:
+        resized = original.resize(
+            (target, max(1, round(height * target / width))), Image.Resampling.LANCZOS
+        )
+        for fmt in FORMATS:
+            buffer = BytesIO()
+            _prepare(resized, fmt).save(buffer, **SAVE_OPTIONS[fmt])
+            output = derivative_name(name, target, fmt)
+            if storage.exists(output):
+                storage.delete(output)
+            variants[fmt].append([target, storage.save(output, ContentFile(buffer.getvalue()))])
+    return {"width": width, "height": height, "variants": variants}
+
+
+def process_post_images(post_id: int) -> dict:
+    """Generate missing derivatives for one post and store its manifest."""
+    from . import pagecache
+    from .models import Post
+    from .richtext import render_content
+
+    post = (
+        Post.objects.filter(pk=post_id)
+        .only("featured_image", "content", "image_variants", "category_id")
+        .first()
+    )
+    if post is None:
+        return {}
+    manifest = {}
+    for name in source_image_names(post):
+        if name in post.image_variants:
+            manifest[name] = post.image_variants[name]
+            continue
+        try:
+            manifest[name] = generate_derivatives(name)
+        except (OSError, ValueError):
+            logger.warning("Could not generate derivatives for %s", name, exc_info=True)
+    if manifest != post.image_variants:
+        with transaction.atomic():
+            # Generating derivatives is slow: render the content as it is now,
+            # not as it was read above, or a concurrent edit would be undone.
+            post = (
+                Post.objects.select_for_update()
+                .only("content", "category_id")
+                .filter(pk=post_id)
+                .first()
+            )
+            if post is None:
+                return {}
+            content_html, toc = render_content(post.content, manifest)
+            # update() rather than save(): this must not re-trigger post_save.
+            Post.objects.filter(pk=post_id).update(
+                image_variants=manifest, content_html=content_html, toc=toc
+            )
+        pagecache.purge(
+            "posts",
+            f"post:{post_id}",
+            f"category:{post.category_id}",
+            *(f"tag:{pk}" for pk in post.tags.values_list("pk", flat=True)),
+        )
+    return manifest
+
+
+def needs_processing(post) -> bool:
+    return any(name not in post.image_variants for name in source_image_names(post))
+
+
+def srcsets(entry: dict, storage=default_storage) -> list:
+    """``(format, srcset)`` pairs for a manifest entry, preferred format first."""
+    result = []
+    for fmt in FORMATS:
+        variants = entry.get("variants", {}).get(fmt)
+        if variants:
+            result.append(
+                (fmt, ", ".join(f"{storage.url(name)} {width}w" for width, name in variants))
+            )
+    return result
+
+
+def picture_html(img_tag: str, entry: dict, sizes: str) -> str:
+    """Wrap an existing ``<img>`` tag in a ``<picture>`` using ``entry``'s variants."""
+    pairs = srcsets(entry)
+    if not pairs:
+        return img_tag
+    *sources, (_, fallback) = pairs
+    attrs = {"srcset": fallback, "sizes": sizes}
+    for dimension in ("width", "height"):
+        if not re.search(rf"\b{dimension}\s*=", img_tag, re.IGNORECASE):
+            attrs[dimension] = entry[dimension]
+    img = format_html(
+        "{}{}>",
+        mark_safe(img_tag[:-1].rstrip(" /")),
+        format_html_join("", ' {}="{}"', attrs.items()),
+    )
+    return format_html(
+        "<picture>{}{}</picture>",
+        format_html_join(
+            "",
+            '<source type="{}" srcset="{}" sizes="{}">',
+            ((MIME_TYPES[fmt], srcset, sizes) for fmt, srcset in sources),
+        ),
+        img,
+    )
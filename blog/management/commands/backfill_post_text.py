@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import TEXT_FIELDS, Post
+from blog.pagecache import purge_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored HTML, table of contents, plain-text body, excerpt and "
+        "reading time of posts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only fill posts whose excerpt is still empty.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of posts updated per query (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only("pk", "content", "image_variants").order_by("pk")
+        if options["missing"]:
+            posts = posts.filter(excerpt="")
+        batch_size = options["batch_size"]
+        total = 0
+        batch = []
+        for post in posts.iterator(chunk_size=batch_size):
+            post.refresh_text_fields()
+            batch.append(post)
+            if len(batch) >= batch_size:
+                Post.objects.bulk_update(batch, TEXT_FIELDS)
+                total += len(batch)
+                batch = []
+        Post.objects.bulk_update(batch, TEXT_FIELDS)
+        total += len(batch)
+        purge_all()
+        self.stdout.write(self.style.SUCCESS(f"Updated {total} posts."))
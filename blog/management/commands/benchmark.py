@@ -0,0 +1,135 @@
+import json
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.benchmark import PERCENTILES, compare, run_benchmark
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the list, detail, search, category, tag and dashboard views against the "
+        "current database and report latency percentiles and query counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Timed requests per scenario (default: 20).",
+        )
+        parser.add_argument(
+            "--sample",
+            type=int,
+            default=20,
+            help="Distinct posts / search terms to rotate through (default: 20).",
+        )
+        parser.add_argument(
+            "--only",
+            action="append",
+            metavar="SCENARIO",
+            help="Only run this scenario. May be repeated.",
+        )
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Leave the anonymous full-page cache enabled.",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Sampling seed (default: 0).")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Clients sending the timed requests in parallel (default: 1).",
+        )
+        parser.add_argument(
+            "--asgi",
+            action="store_true",
+            help=(
+                "Send requests through the ASGI handler (run with BLOG_ASYNC_VIEWS=True "
+                "to route the async views)."
+            ),
+        )
+        parser.add_argument(
+            "--db-latency",
+            type=float,
+            default=0,
+            metavar="MS",
+            help="Milliseconds to add to every query, simulating a remote database (default: 0).",
+        )
+        parser.add_argument("--json", metavar="PATH", help="Save the results as JSON.")
+        parser.add_argument(
+            "--compare",
+            metavar="PATH",
+            help="Show the change against results saved earlier with --json.",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"], encoding="utf-8") as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read {options['compare']}: {exc}")
+
+        results = run_benchmark(
+            iterations=options["iterations"],
+            sample=options["sample"],
+            only=options["only"],
+            page_cache=options["page_cache"],
+            seed=options["seed"],
+            concurrency=options["concurrency"],
+            asgi=options["asgi"],
+            db_latency=options["db_latency"],
+        )
+        results["meta"]["commit"] = _git_commit()
+
+        meta = results["meta"]
+        views = "async" if meta["async_views"] else "sync"
+        templates = "cached" if meta["cached_templates"] else "uncached"
+        self.stdout.write(
+            f"{meta['posts']} published posts on {meta['vendor']}, {meta['handler'].upper()} "
+            f"with {views} views, {meta['iterations']} requests per scenario over "
+            f"{meta['concurrency']} clients, {templates} templates (ms):"
+        )
+        columns = [f"p{percent}" for percent in PERCENTILES] + ["mean", "max", "render", "rps"]
+        self.stdout.write(
+            f"{'scenario':<16}" + "".join(f"{column:>10}" for column in columns) + f"{'queries':>10}"
+        )
+        for name, result in results["scenarios"].items():
+            line = f"{name:<16}" + "".join(
+                f"{result[column]:>10.1f}" if result[column] is not None else f"{'-':>10}"
+                for column in columns
+            )
+            line += f"{result['queries']:>10}"
+            if result["status"] != [200]:
+                line += self.style.WARNING(f"  HTTP {result['status']}")
+            self.stdout.write(line)
+
+        if baseline:
+            self.stdout.write(f"\nChange since {baseline['meta'].get('commit') or options['compare']}:")
+            for name, metric, old, new, change in compare(baseline, results):
+                # Throughput is better higher, everything else lower.
+                worse = -change if metric == "rps" else change
+                style = self.style.ERROR if worse > 10 else self.style.SUCCESS if worse < -10 else str
+                self.stdout.write(f"{name:<16}{metric:>8}{old:>10}{new:>10}  " + style(f"{change:+.1f}%"))
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved results to {options['json']}."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import Post
+from blog.related import rebuild_related_posts, refresh_related_posts
+
+
+class Command(BaseCommand):
+    help = "Compute the related-posts neighbour table (all posts, or just the given ones)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--post",
+            action="append",
+            dest="slugs",
+            metavar="SLUG",
+            help="Only refresh this post and its peers. May be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options["slugs"]:
+            post_ids = list(Post.objects.filter(slug__in=options["slugs"]).values_list("pk", flat=True))
+            if len(post_ids) != len(set(options["slugs"])):
+                raise CommandError("One or more posts do not exist.")
+            links = refresh_related_posts(post_ids)
+        else:
+            links = rebuild_related_posts()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Wrote {links} related-post links in {elapsed:.2f}s."))
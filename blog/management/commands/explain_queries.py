@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.queryplans import check_plans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the post list, category and tag queries and check they use their indexes."
+
+    def handle(self, *args, **options):
+        plans = check_plans()
+        for plan in plans:
+            status = self.style.SUCCESS("ok") if plan.uses_index else self.style.ERROR("NOT USED")
+            self.stdout.write(f"{plan.name}: {' or '.join(plan.indexes)} {status}")
+            if options["verbosity"] > 1 or not plan.uses_index:
+                self.stdout.write(plan.plan + "\n")
+        missing = [plan.name for plan in plans if not plan.uses_index]
+        if missing:
+            raise CommandError(f"Expected index not used by: {', '.join(missing)}.")
@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.fakedata import generate_records
+from blog.related import rebuild_related_posts
+from blog.transfer import import_records, open_archive, write_records
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic users, categories, tags, posts and comments for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1000, help="Number of posts (default: 1000).")
+        parser.add_argument("--users", type=int, default=50, help="Number of users (default: 50).")
+        parser.add_argument(
+            "--categories", type=int, default=12, help="Number of categories (default: 12)."
+        )
+        parser.add_argument("--tags", type=int, default=200, help="Number of tags (default: 200).")
+        parser.add_argument(
+            "--comments",
+            type=int,
+            default=3,
+            help="Average comments per published post (default: 3).",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of records written per transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--output",
+            metavar="PATH",
+            help="Write a JSON Lines archive for import_blog instead of loading the database.",
+        )
+        parser.add_argument(
+            "--skip-related",
+            action="store_true",
+            help="Do not rebuild the related-posts table afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        records = generate_records(
+            options["posts"],
+            users=options["users"],
+            categories=options["categories"],
+            tags=options["tags"],
+            comments=options["comments"],
+            seed=options["seed"],
+        )
+        if options["output"]:
+            with open_archive(options["output"], "w") as stream:
+                written = write_records(records, stream)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Wrote {written} records in {time.monotonic() - started:.2f}s."
+                )
+            )
+            return
+
+        def progress(created):
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"{created['post']} posts in {time.monotonic() - started:.1f}s")
+
+        importer = import_records(records, batch_size=options["batch_size"], progress=progress)
+        if not options["skip_related"]:
+            rebuild_related_posts()
+        elapsed = time.monotonic() - started
+        created = importer.created
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created['user']} users, {created['post']} posts and "
+                f"{created['comment']} comments in {elapsed:.2f}s "
+                f"({created['post'] / max(elapsed, 1e-6):.0f} posts/s)."
+            )
+        )
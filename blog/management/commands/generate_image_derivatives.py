@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from blog.images import process_post_images
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/AVIF/JPEG derivatives for post images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate derivatives that already exist.",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by("pk")
+        if options["force"]:
+            posts.update(image_variants={})
+        images = 0
+        for post_id in posts.values_list("pk", flat=True).iterator():
+            images += len(process_post_images(post_id))
+        self.stdout.write(self.style.SUCCESS(f"Processed {images} images."))
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.related import rebuild_related_posts
+from blog.transfer import ArchiveError, import_records, open_archive, read_records
+
+
+class Command(BaseCommand):
+    help = "Import a JSON Lines archive written by export_blog, skipping rows that already exist."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="Archive to read; '-' for stdin, '*.gz' for a compressed archive.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of records written per transaction (default: 500).",
+        )
+        parser.add_argument(
+            "--skip-related",
+            action="store_true",
+            help="Do not rebuild the related-posts table afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(created):
+            if options["verbosity"] >= 2:
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"{created['post']} posts in {elapsed:.1f}s "
+                    f"({created['post'] / max(elapsed, 1e-6):.0f} posts/s)"
+                )
+
+        try:
+            with open_archive(options["path"]) as stream:
+                importer = import_records(
+                    read_records(stream), batch_size=options["batch_size"], progress=progress
+                )
+        except (ArchiveError, OSError) as exc:
+            raise CommandError(exc)
+        imported = time.monotonic() - started
+        if not options["skip_related"]:
+            rebuild_related_posts()
+
+        created, skipped = importer.created, importer.skipped
+        rows = sum(created.values()) + sum(skipped.values())
+        summary = ", ".join(
+            f"{created[kind]} {label}"
+            for kind, label in (
+                ("user", "users"),
+                ("category", "categories"),
+                ("tag", "tags"),
+                ("post", "posts"),
+                ("comment", "comments"),
+            )
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {summary} in {imported:.2f}s "
+                f"({rows / max(imported, 1e-6):.0f} rows/s); "
+                f"skipped {sum(skipped.values())} existing."
+            )
+        )
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.profiling import hottest_functions, read_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge the sampling profiles recorded for a URL name and list the functions "
+        "with the most samples."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "url_name",
+            nargs="?",
+            help="URL name, e.g. blog:post_list. Without it, list the profiled URL names.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=20,
+            help="Functions to list (default: 20).",
+        )
+        parser.add_argument(
+            "--output",
+            metavar="PATH",
+            help="Also write the merged folded stacks here, for flamegraph.pl or speedscope.",
+        )
+
+    def handle(self, *args, **options):
+        root = Path(settings.BLOG_PROFILE_DIR)
+        if not options["url_name"]:
+            for folder in sorted(path for path in root.glob("*") if path.is_dir()):
+                profiles = len(list(folder.glob("*.folded")))
+                self.stdout.write(f"{folder.name.replace('.', ':', 1)}: {profiles} profiles")
+            return
+        folder = root / options["url_name"].replace(":", ".")
+        stacks = read_profiles(folder)
+        if not stacks:
+            raise CommandError(f"No profiles in {folder}.")
+        samples = sum(stacks.values())
+        profiles = len(list(folder.glob("*.folded")))
+        self.stdout.write(f"{samples} samples from {profiles} profiles")
+        self.stdout.write(f"{'self':>6} {'total':>6}  function")
+        for function, own, total in hottest_functions(stacks, options["top"]):
+            self.stdout.write(f"{own / samples:6.1%} {total / samples:6.1%}  {function}")
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                for stack, count in stacks.most_common():
+                    output.write(f"{stack} {count}\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote merged stacks to {options['output']}."))
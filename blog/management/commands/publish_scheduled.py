@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.scheduling import publish_due_posts
+
+
+class Command(BaseCommand):
+    help = "Publish scheduled posts whose publish date has passed."
+
+    def handle(self, *args, **options):
+        published = publish_due_posts()
+        self.stdout.write(self.style.SUCCESS(f"Published {published} scheduled posts."))
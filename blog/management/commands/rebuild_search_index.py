@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for all posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of posts indexed per batch (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend.vendor is None:
+            self.stdout.write(
+                self.style.WARNING("This database has no search index; nothing to rebuild.")
+            )
+            return
+        with transaction.atomic():
+            total = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} posts ({backend.vendor})."))
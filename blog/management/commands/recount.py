@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from blog.counters import recount_all
+from blog.pagecache import purge_all
+from blog.sidebar import bump_version
+
+
+class Command(BaseCommand):
+    help = "Recompute the published-post counters on categories and tags and the comment counts."
+
+    def handle(self, *args, **options):
+        categories, tags, posts = recount_all()
+        bump_version()
+        purge_all()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recounted {categories} categories, {tags} tags and the comments of {posts} posts."
+            )
+        )
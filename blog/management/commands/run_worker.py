@@ -0,0 +1,62 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from blog import queue
+from blog.scheduling import publish_due_posts
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run every task that is due, then exit.",
+        )
+        parser.add_argument(
+            "--queue",
+            default=queue.DEFAULT_QUEUE,
+            help=f"Only run the tasks of this queue (default: {queue.DEFAULT_QUEUE}).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        requeued = queue.requeue_stale(queue=options["queue"])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale tasks.")
+        if options["queue"] == queue.DEFAULT_QUEUE:
+            # Catch up on posts that came due while no worker was running.
+            published = publish_due_posts()
+            if published:
+                self.stdout.write(f"Published {published} overdue scheduled posts.")
+        while not self.stopping:
+            close_old_connections()
+            task_row = queue.claim_next(queue=options["queue"])
+            if task_row is None:
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+            started = time.monotonic()
+            ok = queue.run_task(task_row)
+            status = self.style.SUCCESS("ok") if ok else self.style.ERROR(task_row.status)
+            self.stdout.write(
+                f"{task_row.name}{tuple(task_row.args)} {status} "
+                f"in {time.monotonic() - started:.2f}s"
+            )
+
+    def stop(self, signum, frame):
+        self.stopping = True
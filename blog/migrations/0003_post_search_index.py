@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from blog.search import get_backend
+
+    Post = apps.get_model("blog", "Post")
+    backend = get_backend(schema_editor.connection)
+    posts = Post.objects.using(schema_editor.connection.alias).select_related(
+        "category"
+    ).prefetch_related("tags")
+    with schema_editor.connection.cursor() as cursor:
+        backend.create_index(cursor)
+        backend.index_posts(cursor, posts)
+
+
+def drop_search_index(apps, schema_editor):
+    from blog.search import get_backend
+
+    backend = get_backend(schema_editor.connection)
+    with schema_editor.connection.cursor() as cursor:
+        backend.drop_index(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0002_alter_post_content_alter_post_publish_date"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
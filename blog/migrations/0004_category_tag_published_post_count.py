@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:49
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def populate_counts(apps, schema_editor):
+    Category = apps.get_model("blog", "Category")
+    Tag = apps.get_model("blog", "Tag")
+    Post = apps.get_model("blog", "Post")
+    published = Post.objects.filter(status="published", publish_date__lte=timezone.now())
+    category_counts = published.values("category").annotate(total=Count("pk"))
+    for row in category_counts:
+        if row["category"]:
+            Category.objects.filter(pk=row["category"]).update(published_post_count=row["total"])
+    tag_counts = Post.tags.through.objects.filter(post__in=published).values("tag").annotate(
+        total=Count("pk")
+    )
+    for row in tag_counts:
+        Tag.objects.filter(pk=row["tag"]).update(published_post_count=row["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-17 15:55
+
+from django.db import migrations, models
+
+from blog.text import count_words, html_to_text, make_excerpt, reading_time
+
+
+def populate_text_fields(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    fields = ["body_text", "excerpt", "word_count", "reading_time"]
+    batch = []
+    for post in Post.objects.only("pk", "content").iterator(chunk_size=500):
+        post.body_text = html_to_text(post.content)
+        post.excerpt = make_excerpt(post.body_text)
+        post.word_count = count_words(post.body_text)
+        post.reading_time = reading_time(post.word_count)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, fields)
+            batch = []
+    Post.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_category_tag_published_post_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='body_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_text_fields, migrations.RunPython.noop),
+    ]
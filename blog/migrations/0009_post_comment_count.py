@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:22
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_comment_counts(apps, schema_editor):
+    Comment = apps.get_model("blog", "Comment")
+    Post = apps.get_model("blog", "Post")
+    counts = Comment.objects.filter(active=True).values("post").annotate(total=Count("pk"))
+    for row in counts:
+        Post.objects.filter(pk=row["post"]).update(comment_count=row["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_comment_counts, migrations.RunPython.noop),
+    ]
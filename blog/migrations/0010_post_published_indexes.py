@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_post_comment_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-publish_date', '-id'], name='post_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['category', '-publish_date', '-id'], name='post_category_published_idx'),
+        ),
+        # The auto-created tags through table has no Meta to declare this on. A
+        # covering (tag_id, post_id) index lets a tag page find its post ids
+        # without touching the through table's rows.
+        migrations.RunSQL(
+            'CREATE INDEX "post_tags_tag_post_idx" ON "blog_post_tags" ("tag_id", "post_id")',
+            'DROP INDEX "post_tags_tag_post_idx"',
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:34
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_scheduled_posts(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    Task = apps.get_model("blog", "Task")
+    scheduled = Post.objects.filter(status="published", publish_date__gt=timezone.now())
+    publish_dates = set(scheduled.values_list("publish_date", flat=True))
+    scheduled.update(status="scheduled")
+    Task.objects.bulk_create(
+        Task(name="blog.publish_scheduled_posts", run_at=publish_date)
+        for publish_date in sorted(publish_dates)
+    )
+
+
+def unmark_scheduled_posts(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    Task = apps.get_model("blog", "Task")
+    Post.objects.filter(status="scheduled").update(status="published")
+    Task.objects.filter(name="blog.publish_scheduled_posts", status="queued").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_post_published_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('scheduled', 'Scheduled'), ('published', 'Published')], default='draft', max_length=10),
+        ),
+        migrations.RunPython(mark_scheduled_posts, unmark_scheduled_posts),
+    ]
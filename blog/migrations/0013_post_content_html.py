@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+from blog.richtext import render_content
+
+
+def render_content_html(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    batch = []
+    for post in Post.objects.only("pk", "content", "image_variants").iterator(chunk_size=500):
+        post.content_html, post.toc = render_content(post.content, post.image_variants)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ["content_html", "toc"])
+            batch = []
+    Post.objects.bulk_update(batch, ["content_html", "toc"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_post_published_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(render_content_html, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 19:32
+
+from django.db import migrations, models
+
+
+def route_image_tasks(apps, schema_editor):
+    # Queued before tasks had queues; see blog.tasks.process_post_images.
+    Task = apps.get_model("blog", "Task")
+    Task.objects.filter(name="blog.process_post_images").update(queue="media")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0013_post_content_html"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="task",
+            name="task_status_run_at_idx",
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="queue",
+            field=models.CharField(default="default", max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                fields=["queue", "status", "run_at"], name="task_queue_status_run_at_idx"
+            ),
+        ),
+        migrations.RunPython(route_image_tasks, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,22 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.utils.text import slugify
 from django.urls import reverse
 from ckeditor_uploader.fields import RichTextUploadingField
 
+from .richtext import render_content
+from .slugs import save_with_unique_slug
+from .text import count_words, html_to_text, make_excerpt, reading_time
+
+# Columns derived from Post.content by Post.refresh_text_fields().
+TEXT_FIELDS = ("content_html", "toc", "body_text", "excerpt", "word_count", "reading_time")
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=120, unique=True)
     description = models.TextField(blank=True)
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["name"]
@@ -18,14 +25,13 @@ class Category(models.Model):
         return self.name
 
     def save(self, *args, **kwargs) -> None:
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        save_with_unique_slug(self, self.name, super().save, *args, **kwargs)
 
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=60, unique=True)
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ["name"]
@@ -34,14 +40,13 @@ class Tag(models.Model):
         return self.name
 
     def save(self, *args, **kwargs) -> None:
-        if not self.slug:
-            self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        save_with_unique_slug(self, self.name, super().save, *args, **kwargs)
 
 
 class Post(models.Model):
     STATUS_CHOICES = [
         ("draft", "Draft"),
+        ("scheduled", "Scheduled"),
         ("published", "Published"),
     ]
 
@@ -56,7 +61,18 @@ class Post(models.Model):
     )
     tags = models.ManyToManyField(Tag, related_name="posts", blank=True)
     featured_image = models.ImageField(upload_to="posts/", blank=True, null=True)
+    # Resized derivatives of the featured and inline images; see blog.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     content = RichTextUploadingField()
+    # Sanitized, ready-to-serve content and its headings; see blog.richtext.
+    content_html = models.TextField(blank=True, editable=False)
+    toc = models.JSONField(default=list, blank=True, editable=False)
+    body_text = models.TextField(blank=True, editable=False)
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False)
+    # Active comments; maintained by blog.counters.recount_comments().
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="draft")
     publish_date = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -64,6 +80,26 @@ class Post(models.Model):
 
     class Meta:
         ordering = ["-publish_date"]
+        # Public pages only ever read published posts, newest first (with the
+        # pk as tie-breaker for the cursor paginator); see blog.queryplans.
+        indexes = [
+            models.Index(
+                fields=["-publish_date", "-id"],
+                name="post_published_idx",
+                condition=models.Q(status="published"),
+            ),
+            models.Index(
+                fields=["category", "-publish_date", "-id"],
+                name="post_category_published_idx",
+                condition=models.Q(status="published"),
+            ),
+            # MAX(updated_at) validates conditional GETs; see blog.conditional.
+            models.Index(
+                fields=["updated_at"],
+                name="post_published_updated_idx",
+                condition=models.Q(status="published"),
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
@@ -73,18 +109,35 @@ class Post(models.Model):
 
     @property
     def is_published(self) -> bool:
-        return self.status == "published" and self.publish_date <= timezone.now()
+        return self.status == "published"
+
+    def resolve_status(self) -> None:
+        """Hold a "published" post with a future date as "scheduled", and vice versa.
+
+        ``blog.scheduling`` flips scheduled posts live when their time comes, so
+        public queries can filter on ``status`` alone.
+        """
+        if self.status == "draft":
+            return
+        self.status = "scheduled" if self.publish_date > timezone.now() else "published"
+
+    def refresh_text_fields(self) -> None:
+        """Derive the rendered HTML, plain-text body, excerpt and reading stats from ``content``."""
+        self.content_html, self.toc = render_content(self.content, self.image_variants)
+        self.body_text = html_to_text(self.content)
+        self.excerpt = make_excerpt(self.body_text)
+        self.word_count = count_words(self.body_text)
+        self.reading_time = reading_time(self.word_count)
 
     def save(self, *args, **kwargs) -> None:
-        if not self.slug:
-            base_slug = slugify(self.title)
-            slug = base_slug
-            counter = 1
-            while self.__class__.objects.filter(slug=slug).exclude(pk=self.pk).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "status" in update_fields:
+            self.resolve_status()
+        if update_fields is None or "content" in update_fields:
+            self.refresh_text_fields()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | set(TEXT_FIELDS)
+        save_with_unique_slug(self, self.title, super().save, *args, **kwargs)
 
 
 class Comment(models.Model):
@@ -99,3 +152,58 @@ class Comment(models.Model):
 
     def __str__(self) -> str:
         return f"Comment by {self.author} on {self.post}"
+
+
+class RelatedPost(models.Model):
+    """Precomputed "related posts" neighbours; see ``blog.related``."""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="related_links")
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ["post", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["post", "rank"], name="relatedpost_post_rank_uniq"),
+            models.UniqueConstraint(
+                fields=["post", "related"], name="relatedpost_post_related_uniq"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.post} -> {self.related} ({self.score:.3f})"
+
+
+class Task(models.Model):
+    """A unit of background work; see ``blog.queue``."""
+
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    # Each worker claims the tasks of one queue (`run_worker --queue`).
+    queue = models.CharField(max_length=20, default="default")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["run_at", "pk"]
+        indexes = [
+            models.Index(fields=["queue", "status", "run_at"], name="task_queue_status_run_at_idx")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.status})"
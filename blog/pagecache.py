@@ -0,0 +1,179 @@
+"""Full-page cache for anonymous readers.
+
+Pages are cached per path, the query parameters the pages read
+(``PAGE_PARAMS``; others such as ``utm_source`` share the entry) and
+``BLOG_BUILD_ID``, so a deploy starts from an empty cache even when the cache
+outlives the processes. Each
+entry records the dependency tokens (``post:<id>``, ``category:<id>``,
+``tag:<id>``, ``posts``, ``sidebar``) that were current when it was rendered;
+``purge`` replaces a token, which invalidates exactly the pages that depend on
+it. Tokens are random
+rather than counters so an evicted token can never make an old page valid
+again.
+"""
+import hashlib
+import uuid
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+PAGE_KEY = "blog:page:{}"
+TOKEN_KEY = "blog:page-dep:{}"
+# Every page implicitly depends on this token; see purge_all().
+SITE_DEPENDENCY = "site"
+# The only query parameters the cached views and templates read.
+PAGE_PARAMS = ("comments", "cursor", "q")
+
+
+def get_timeout() -> int:
+    return getattr(settings, "BLOG_PAGE_CACHE_TIMEOUT", 60 * 10)
+
+
+def _new_token() -> str:
+    return uuid.uuid4().hex
+
+
+def purge(*dependencies) -> None:
+    """Invalidate every cached page that depends on any of ``dependencies``."""
+    if dependencies:
+        cache.set_many({TOKEN_KEY.format(dep): _new_token() for dep in dependencies}, None)
+
+
+def purge_all() -> None:
+    """Invalidate every cached page, e.g. after a bulk update that skips signals."""
+    purge(SITE_DEPENDENCY)
+
+
+def current_tokens(dependencies) -> dict:
+    """Map each dependency to its current token, creating missing ones."""
+    keys = {TOKEN_KEY.format(dep): dep for dep in dependencies}
+    found = cache.get_many(keys)
+    tokens = {keys[key]: token for key, token in found.items()}
+    for key, dep in keys.items():
+        if key not in found:
+            token = _new_token()
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+            tokens[dep] = token
+    return tokens
+
+
+def is_cacheable_request(request) -> bool:
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and "messages" not in request.COOKIES
+    )
+
+
+async def ais_cacheable_request(request) -> bool:
+    if request.method not in ("GET", "HEAD") or "messages" in request.COOKIES:
+        return False
+    user = await request.auser()
+    return not user.is_authenticated
+
+
+def build_id() -> str:
+    return getattr(settings, "BLOG_BUILD_ID", "")
+
+
+def page_key(request) -> str:
+    # Read with .get() as the views do, so the key sees the values they use.
+    params = urlencode([(name, request.GET[name]) for name in PAGE_PARAMS if name in request.GET])
+    key = f"{build_id()}|{request.path}?{params}"
+    digest = hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+    return PAGE_KEY.format(digest)
+
+
+def get_page(request):
+    """Return the cached response for ``request``, or ``None``."""
+    entry = cache.get(page_key(request))
+    if entry is None:
+        return None
+    found = cache.get_many([TOKEN_KEY.format(dep) for dep in entry["dependencies"]])
+    for dep, token in entry["dependencies"].items():
+        if found.get(TOKEN_KEY.format(dep)) != token:
+            return None
+    response = HttpResponse(entry["content"], status=entry["status"])
+    for header, value in entry["headers"]:
+        response.headers[header] = value
+    response.headers["X-Page-Cache"] = "hit"
+    return response
+
+
+def store_page(request, response, dependencies, timeout=None) -> None:
+    if response.status_code != 200 or response.cookies or response.streaming:
+        return
+    if timeout is None:
+        timeout = get_timeout()
+    if timeout <= 0:
+        return
+    entry = {
+        "content": response.content,
+        "status": response.status_code,
+        "headers": list(response.headers.items()),
+        "dependencies": current_tokens([SITE_DEPENDENCY, *dependencies]),
+    }
+    cache.set(page_key(request), entry, timeout)
+    response.headers["X-Page-Cache"] = "miss"
+
+
+class PageCacheMixin:
+    """Serve and store anonymous GETs through the page cache.
+
+    Views declare what a page shows by implementing
+    ``get_cache_dependencies()``; it is called after the view ran, so it can
+    use ``self.object`` and friends.
+    """
+
+    def get_cache_dependencies(self) -> list:
+        raise NotImplementedError
+
+    def get_cache_timeout(self) -> int:
+        return get_timeout()
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch_page_cache(request, *args, **kwargs)
+        if not is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+        cached = get_page(request)
+        if cached is not None:
+            return self.cached_response(request, cached)
+        return self.store_response(request, super().dispatch(request, *args, **kwargs))
+
+    async def adispatch_page_cache(self, request, *args, **kwargs):
+        if not await ais_cacheable_request(request):
+            return await super().dispatch(request, *args, **kwargs)
+        cached = await sync_to_async(get_page)(request)
+        if cached is not None:
+            return self.cached_response(request, cached)
+        return self.store_response(request, await super().dispatch(request, *args, **kwargs))
+
+    def cached_response(self, request, cached):
+        # A valid entry is current, so its stored validators answer
+        # conditional requests without touching the database.
+        return get_conditional_response(
+            request,
+            etag=cached.get("ETag"),
+            last_modified=parse_http_date_safe(cached.get("Last-Modified", "")),
+            response=cached,
+        )
+
+    def store_response(self, request, response):
+        if request.method != "GET" or response.status_code != 200:
+            return response
+
+        def store(rendered):
+            store_page(request, rendered, self.get_cache_dependencies(), self.get_cache_timeout())
+
+        if hasattr(response, "add_post_render_callback") and not response.is_rendered:
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+        return response
@@ -0,0 +1,145 @@
+"""Keyset (cursor) pagination.
+
+Pages are addressed by an opaque token holding the sort key of the row at the
+page boundary, so fetching any page is a single indexed range query of
+``per_page + 1`` rows: no ``COUNT(*)`` and no ``OFFSET``.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, next_values=None, previous_values=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = paginator.encode_cursor(next_values, "next") if next_values else None
+        self.previous_cursor = (
+            paginator.encode_cursor(previous_values, "previous") if previous_values else None
+        )
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginate ``queryset`` by ``ordering``, which must end in a unique field."""
+
+    def __init__(self, queryset, per_page: int, ordering=("-publish_date", "-pk")):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip("-") for name in self.ordering]
+
+    def encode_cursor(self, values, direction: str) -> str:
+        # isoformat() directly: DjangoJSONEncoder would drop the microseconds
+        # the seek comparison depends on.
+        values = [value.isoformat() if hasattr(value, "isoformat") else value for value in values]
+        payload = json.dumps({"v": values, "d": direction})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values, direction = payload["v"], payload["d"]
+        except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+            raise InvalidCursor(cursor) from exc
+        if direction not in ("next", "previous") or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        return [self._to_python(name, value) for name, value in zip(self.fields, values)], direction
+
+    def _to_python(self, name: str, value):
+        opts = self.queryset.model._meta
+        try:
+            field = opts.pk if name == "pk" else opts.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) are plain JSON numbers.
+            if not isinstance(value, (int, float)):
+                raise InvalidCursor(value)
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError as exc:
+            raise InvalidCursor(value) from exc
+
+    def _values(self, obj):
+        return [getattr(obj, name) for name in self.fields]
+
+    def _seek(self, values, forward: bool) -> Q:
+        """Rows strictly after (or before) ``values`` in ``self.ordering``."""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip("-")
+            descending = name.startswith("-")
+            lookup = "lt" if descending == forward else "gt"
+            condition |= equal & Q(**{f"{field}__{lookup}": value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def _page_query(self, cursor):
+        """The slice of rows to fetch for ``cursor``, and the page direction."""
+        queryset = self.queryset.order_by(*self.ordering)
+        if not cursor:
+            return queryset[: self.per_page + 1], None
+        values, direction = self.decode_cursor(cursor)
+        if direction == "next":
+            return queryset.filter(self._seek(values, forward=True))[: self.per_page + 1], direction
+        reverse = [name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering]
+        rows = queryset.filter(self._seek(values, forward=False)).order_by(*reverse)
+        return rows[: self.per_page + 1], direction
+
+    def _make_page(self, rows, direction) -> CursorPage:
+        has_more = len(rows) > self.per_page
+        if direction is None:
+            rows = rows[: self.per_page]
+            return CursorPage(
+                rows, self, next_values=self._values(rows[-1]) if has_more else None
+            )
+        if direction == "next":
+            rows = rows[: self.per_page]
+            return CursorPage(
+                rows,
+                self,
+                next_values=self._values(rows[-1]) if has_more else None,
+                previous_values=self._values(rows[0]) if rows else None,
+            )
+        rows = rows[: self.per_page][::-1]
+        return CursorPage(
+            rows,
+            self,
+            next_values=self._values(rows[-1]) if rows else None,
+            previous_values=self._values(rows[0]) if has_more else None,
+        )
+
+    def page(self, cursor=None) -> CursorPage:
+        rows, direction = self._page_query(cursor)
+        return self._make_page(list(rows), direction)
+
+    async def apage(self, cursor=None) -> CursorPage:
+        """``page()`` through the async ORM."""
+        rows, direction = self._page_query(cursor)
+        return self._make_page([row async for row in rows], direction)
@@ -0,0 +1,182 @@
+"""On-demand sampling profiler for individual requests.
+
+``SamplingProfilerMiddleware`` profiles a request when a staff user asks for
+it (``?_profile=1`` or an ``X-Profile: 1`` header) or when it falls in the
+``BLOG_PROFILE_SAMPLE_RATE`` fraction of all traffic. Every other request pays
+one ``random()`` call and a header lookup.
+
+A profiled request gets a background thread that wakes up every
+``BLOG_PROFILE_INTERVAL_MS`` and records the request thread's current stack
+from ``sys._current_frames()``. Nothing is installed with ``sys.setprofile``,
+so the request runs at full speed apart from the sampler's share of the GIL.
+Stacks are written in the collapsed ("folded") format read by
+``flamegraph.pl``, speedscope and similar tools, one file per request under
+``BLOG_PROFILE_DIR/<url name>/``; ``manage.py profile_report <url name>``
+merges them and lists the hottest functions. Frames of
+``django.template.base.Template.render`` carry the template name, so template
+rendering shows up per template.
+
+Only one thread is sampled: the one running the request. Under ASGI, where the
+middleware runs on the event loop, that is the thread running the request's
+sync code (ORM calls, template rendering), not the loop itself.
+"""
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.base import Template
+
+QUERY_FLAG = "_profile"
+HEADER = "X-Profile"
+MAX_DEPTH = 200
+_TEMPLATE_RENDER_CODE = Template.render.__code__
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    name = f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+    if code is _TEMPLATE_RENDER_CODE:
+        template = frame.f_locals.get("self")
+        name += f" [{getattr(template, 'name', None) or '<string>'}]"
+    return name.replace(";", ":")
+
+
+def collapse(frame) -> str:
+    """The stack ending at ``frame``, outermost first, separated by ``;``."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """Sample one thread's stack every ``interval`` seconds until stopped."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="blog-profiler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # Once stopped, the thread is only waiting in join(): not its work.
+            if frame is not None and not self._stopped.is_set():
+                self.stacks[collapse(frame)] += 1
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+
+def write_profile(directory, name: str, stacks: Counter) -> Path:
+    """Write ``stacks`` as a folded-stacks file under ``directory/name/``."""
+    folder = Path(directory) / name.replace(":", ".")
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}.folded"
+    with open(path, "w") as output:
+        for stack, count in stacks.most_common():
+            output.write(f"{stack} {count}\n")
+    return path
+
+
+def read_profiles(folder) -> Counter:
+    """Merge every folded-stacks file in ``folder``."""
+    stacks = Counter()
+    for path in sorted(Path(folder).glob("*.folded")):
+        with open(path) as profile:
+            for line in profile:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack:
+                    stacks[stack] += int(count)
+    return stacks
+
+
+def hottest_functions(stacks: Counter, limit: int = 20):
+    """``(function, self samples, total samples)`` rows, most self time first."""
+    own = Counter()
+    total = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(function, samples, total[function]) for function, samples in own.most_common(limit)]
+
+
+class SamplingProfilerMiddleware:
+    """Profile staff-requested and randomly sampled requests."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "BLOG_PROFILE_DIR", None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        requested = self.is_flagged(request) and request.user.is_staff
+        if not requested and not self.is_sampled():
+            return self.get_response(request)
+        with Sampler(threading.get_ident(), self.interval()) as sampler:
+            response = self.get_response(request)
+        return self.finish(request, response, sampler, requested)
+
+    async def __acall__(self, request):
+        requested = self.is_flagged(request) and (await request.auser()).is_staff
+        if not requested and not self.is_sampled():
+            return await self.get_response(request)
+        # The thread that sync_to_async runs this request's sync code in.
+        thread_id = await sync_to_async(threading.get_ident)()
+        sampler = Sampler(thread_id, self.interval()).__enter__()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(sampler.__exit__, thread_sensitive=False)(None, None, None)
+        return await sync_to_async(self.finish, thread_sensitive=False)(
+            request, response, sampler, requested
+        )
+
+    def finish(self, request, response, sampler, requested):
+        if sampler.samples:
+            name = request.resolver_match.view_name if request.resolver_match else "unresolved"
+            path = write_profile(settings.BLOG_PROFILE_DIR, name, sampler.stacks)
+            if requested:
+                response.headers[HEADER] = f"{path.parent.name}/{path.name} ({sampler.samples} samples)"
+        return response
+
+    @staticmethod
+    def interval() -> float:
+        return getattr(settings, "BLOG_PROFILE_INTERVAL_MS", 5) / 1000
+
+    @staticmethod
+    def is_sampled() -> bool:
+        return random.random() < getattr(settings, "BLOG_PROFILE_SAMPLE_RATE", 0)
+
+    @staticmethod
+    def is_flagged(request) -> bool:
+        return request.GET.get(QUERY_FLAG) == "1" or request.headers.get(HEADER) == "1"
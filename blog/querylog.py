@@ -0,0 +1,165 @@
+"""SQL query instrumentation: per-request logging, N+1 detection and test budgets.
+
+``QueryLog`` installs a ``connection.execute_wrapper`` on every database
+connection, so it sees each query whether or not ``DEBUG`` is on. Queries are
+grouped by *shape* (the SQL with literals and ``IN (...)`` lists collapsed):
+the same shape running several times in one request is the signature of an N+1
+loop, e.g. a template touching ``comment.author`` for every comment.
+
+* ``QueryLogMiddleware`` logs the query count of every request and warns about
+  repeated shapes. It is on when ``BLOG_QUERY_LOG`` is (default: ``DEBUG``).
+* ``QueryBudgetMixin`` gives test cases ``assertQueryBudget``, which fails when
+  a block runs more queries than allowed or repeats a query shape.
+"""
+import logging
+import re
+import time
+from collections import Counter, namedtuple
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# A shape seen this many times in one request is reported as a likely N+1.
+REPEAT_THRESHOLD = 3
+
+Query = namedtuple("Query", "alias sql params duration")
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+
+
+def query_shape(sql: str) -> str:
+    """``sql`` with literals replaced by ``?`` and value lists by ``(...)``."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    return _LIST_RE.sub("(...)", sql)
+
+
+class QueryLog:
+    """Record every query run inside the ``with`` block, on every connection."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._wrapper(connection.alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append(Query(alias, sql, params, time.perf_counter() - started))
+
+        return record
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        """Total time spent in the database, in seconds."""
+        return sum(query.duration for query in self.queries)
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> dict:
+        """Query shapes that ran at least ``threshold`` times, with their counts."""
+        shapes = Counter(query_shape(query.sql) for query in self.queries)
+        return {shape: count for shape, count in shapes.most_common() if count >= threshold}
+
+    def report(self) -> str:
+        lines = [f"{len(self)} queries in {self.duration * 1000:.1f}ms:"]
+        lines += [
+            f"{number}. [{query.duration * 1000:.1f}ms] {query.sql}"
+            for number, query in enumerate(self.queries, 1)
+        ]
+        return "\n".join(lines)
+
+
+def _describe_repeats(repeated: dict) -> str:
+    return "; ".join(f"{count}x {shape[:200]}" for shape, count in repeated.items())
+
+
+class QueryLogMiddleware:
+    """Log how many queries each request ran, warning on repeated query shapes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "BLOG_QUERY_LOG", settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryLog() as log:
+            response = self.get_response(request)
+        self.report(request, log)
+        return response
+
+    async def __acall__(self, request):
+        # Connections are per thread: install the wrappers in the one that runs
+        # this request's queries (see sync_to_async's thread_sensitive mode).
+        log = QueryLog()
+        await sync_to_async(log.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(log.__exit__)(None, None, None)
+        self.report(request, log)
+        return response
+
+    @staticmethod
+    def report(request, log) -> None:
+        repeated = log.repeated()
+        if repeated:
+            logger.warning(
+                "%s %s ran %d queries (%.1fms); repeated: %s",
+                request.method,
+                request.get_full_path(),
+                len(log),
+                log.duration * 1000,
+                _describe_repeats(repeated),
+            )
+        else:
+            logger.debug(
+                "%s %s ran %d queries (%.1fms)",
+                request.method,
+                request.get_full_path(),
+                len(log),
+                log.duration * 1000,
+            )
+
+
+class QueryBudgetMixin:
+    """``TestCase`` mixin adding ``assertQueryBudget``."""
+
+    @contextmanager
+    def assertQueryBudget(self, budget: int, repeats: int = REPEAT_THRESHOLD):
+        """Fail if the block runs more than ``budget`` queries or repeats a query shape."""
+        with QueryLog() as log:
+            yield log
+        problems = []
+        if len(log) > budget:
+            problems.append(f"ran {len(log)} queries, budget is {budget}")
+        repeated = log.repeated(repeats)
+        if repeated:
+            problems.append(f"repeated query shapes (possible N+1): {_describe_repeats(repeated)}")
+        if problems:
+            self.fail("; ".join(problems) + "\n" + log.report())
@@ -0,0 +1,70 @@
+"""EXPLAIN checks for the public post listings.
+
+The post list, category and tag pages all read published posts newest first,
+and each has an index shaped for it (see ``Post.Meta.indexes`` and migration
+0010). ``check_plans`` builds the querysets the real views run, asks the
+database for their plans and reports whether the expected index shows up, so a
+refactor that quietly stops using one (a new filter, a different ordering) is
+caught by ``manage.py explain_queries`` and the test suite.
+
+Postgres happily sequential-scans a table with a handful of rows, so on that
+backend the plans are taken with ``enable_seqscan`` off: the question is
+whether the index *can* serve the query, not whether it is worth it on a tiny
+test database. SQLite has no statistics unless ``ANALYZE`` has run and picks
+the index whenever it applies.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from .models import Category, Tag
+from .views import CategoryPostListView, PostListView, TagPostListView
+
+Plan = namedtuple("Plan", "name indexes plan uses_index")
+
+# Index names any of which satisfies a listing. A tag page either walks the
+# covering (tag, post) index or the published-post index, probing the tags.
+EXPECTED_INDEXES = {
+    "post_list": ("post_published_idx",),
+    "category": ("post_category_published_idx",),
+    "tag": ("post_tags_tag_post_idx", "post_published_idx"),
+}
+
+
+def _view_queryset(view_class, **kwargs):
+    view = view_class()
+    view.setup(RequestFactory().get("/"), **kwargs)
+    # One page plus the "has next" probe, as the cursor paginator fetches it.
+    return view.get_queryset()[: view.paginate_by + 1]
+
+
+def listing_querysets() -> dict:
+    """Map listing names to the querysets their views run for the first page."""
+    querysets = {"post_list": _view_queryset(PostListView)}
+    category = Category.objects.order_by("-published_post_count").first()
+    if category:
+        querysets["category"] = _view_queryset(CategoryPostListView, slug=category.slug)
+    tag = Tag.objects.order_by("-published_post_count").first()
+    if tag:
+        querysets["tag"] = _view_queryset(TagPostListView, slug=tag.slug)
+    return querysets
+
+
+def explain(queryset) -> str:
+    if connection.vendor != "postgresql":
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+def check_plans() -> list:
+    """A ``Plan`` per listing, with whether one of its expected indexes is used."""
+    plans = []
+    for name, queryset in listing_querysets().items():
+        indexes = EXPECTED_INDEXES[name]
+        plan = explain(queryset)
+        plans.append(Plan(name, indexes, plan, any(index in plan for index in indexes)))
+    return plans
@@ -0,0 +1,159 @@
+"""A small database-backed task queue.
+
+Tasks are rows in ``blog_task``; ``python manage.py run_worker`` claims and runs
+them, so no external broker is needed. Register a function with ``@task`` and
+queue it with ``enqueue``::
+
+    @task()
+    def refresh_related(post_id): ...
+
+    enqueue("blog.refresh_related", post.pk)
+
+Tasks are inserted when the surrounding transaction commits, so a worker never
+sees work for rows that were rolled back. A task registered with
+``@task(queue="media")`` is only claimed by ``run_worker --queue media``, so
+work that needs a particular machine (its disk, say) runs there. With ``BLOG_TASKS_EAGER`` (the
+default while ``DEBUG`` is on) tasks run in-process right after the commit
+instead.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+DEFAULT_QUEUE = "default"
+RETRY_BASE_DELAY = 10  # seconds; doubles with every attempt
+STALE_AFTER = timedelta(minutes=15)
+
+
+class UnknownTask(KeyError):
+    pass
+
+
+def task(name=None, max_attempts=3, queue=DEFAULT_QUEUE):
+    """Register a function as a task, by default under ``<app>.<function>``."""
+
+    def decorator(func):
+        task_name = name or f"{func.__module__.split('.')[0]}.{func.__name__}"
+        func.task_name = task_name
+        func.max_attempts = max_attempts
+        func.queue = queue
+        _registry[task_name] = func
+        return func
+
+    return decorator
+
+
+def get_task(name: str):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise UnknownTask(name) from None
+
+
+def is_eager() -> bool:
+    return getattr(settings, "BLOG_TASKS_EAGER", False)
+
+
+def enqueue(name: str, *args, run_at=None, dedupe=False, **kwargs) -> None:
+    """Queue ``name(*args, **kwargs)`` to run once the current transaction commits.
+
+    With ``dedupe`` no new row is added if an identical task is still queued.
+    """
+    func = get_task(name)
+    if is_eager() and run_at is None:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+
+    def insert():
+        fields = {"name": name, "args": list(args), "kwargs": kwargs}
+        if dedupe and Task.objects.filter(status="queued", **fields).exists():
+            return
+        Task.objects.create(
+            run_at=run_at or timezone.now(),
+            max_attempts=func.max_attempts,
+            queue=func.queue,
+            **fields,
+        )
+
+    transaction.on_commit(insert)
+
+
+def claim_next(now=None, queue=DEFAULT_QUEUE):
+    """Atomically mark the next due task of ``queue`` as running and return it (or ``None``).
+
+    The compare-and-set ``UPDATE ... WHERE status = 'queued'`` lets several
+    workers share the table on SQLite and PostgreSQL alike.
+    """
+    now = now or timezone.now()
+    candidates = Task.objects.filter(queue=queue, status="queued", run_at__lte=now).values_list(
+        "pk", flat=True
+    )[:10]
+    for pk in candidates:
+        claimed = Task.objects.filter(pk=pk, status="queued").update(
+            status="running", locked_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def run_task(task_row) -> bool:
+    """Run a claimed task, recording success or scheduling a retry."""
+    try:
+        get_task(task_row.name)(*task_row.args, **task_row.kwargs)
+    except Exception:
+        task_row.last_error = traceback.format_exc()
+        now = timezone.now()
+        if task_row.attempts >= task_row.max_attempts:
+            task_row.status = "failed"
+            task_row.finished_at = now
+            logger.error("Task %s failed permanently", task_row, exc_info=True)
+        else:
+            task_row.status = "queued"
+            task_row.run_at = now + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (task_row.attempts - 1))
+            logger.warning("Task %s failed, retrying at %s", task_row, task_row.run_at)
+        task_row.locked_at = None
+        task_row.save(update_fields=["status", "run_at", "locked_at", "finished_at", "last_error"])
+        return False
+    task_row.status = "done"
+    task_row.finished_at = timezone.now()
+    task_row.locked_at = None
+    task_row.save(update_fields=["status", "finished_at", "locked_at"])
+    return True
+
+
+def requeue_stale(older_than=STALE_AFTER, queue=DEFAULT_QUEUE) -> int:
+    """Put back tasks of ``queue`` whose worker died mid-run."""
+    return Task.objects.filter(
+        queue=queue, status="running", locked_at__lt=timezone.now() - older_than
+    ).update(status="queued", locked_at=None)
+
+
+def run_pending(limit=None, queue=DEFAULT_QUEUE) -> int:
+    """Run due tasks of ``queue`` until none are left (or ``limit`` ran). Returns the count."""
+    ran = 0
+    while limit is None or ran < limit:
+        task_row = claim_next(queue=queue)
+        if task_row is None:
+            break
+        run_task(task_row)
+        ran += 1
+    return ran
+
+
+def purge_finished(older_than=timedelta(days=7)) -> int:
+    deleted, _ = Task.objects.filter(
+        status="done", finished_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
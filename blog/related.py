@@ -0,0 +1,291 @@
+"""Related-posts engine.
+
+Posts are scored pairwise by a blend of shared tags (Jaccard) and TF-IDF cosine
+similarity of their title and plain-text body. Vectors are sparse dicts and the
+pairwise scores are accumulated through an inverted index, so only pairs that
+share at least one term or tag are ever compared. The best ``NEIGHBOURS`` per
+post are stored in ``RelatedPost`` and read back by ``PostDetailView`` with one
+indexed lookup.
+
+``rebuild_related_posts`` recomputes everything and caches the corpus's
+document frequencies. ``refresh_related_posts`` then only loads the changed
+posts and the posts sharing a tag or a term with them (found through the search
+index), scores them with the cached frequencies, and merges the changed posts
+into their peers' lists. The lists that showed a changed post are recomputed
+too, as it may have dropped out of them. Frequencies drift as posts change
+until the next rebuild, or until the cache entry expires and a refresh loads
+the whole corpus again. Both functions purge the cached pages of the posts
+whose list changed (see ``blog.pagecache``).
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import pagecache
+from .models import Post, RelatedPost
+from .search import posts_with_any_word
+
+NEIGHBOURS = 6
+TAG_WEIGHT = 0.6
+TEXT_WEIGHT = 0.4
+TITLE_BOOST = 3
+# Terms found in more than this share of posts say nothing about relatedness.
+MAX_DOCUMENT_FREQUENCY = 0.5
+FREQUENCIES_KEY = "blog:related:frequencies"
+FREQUENCIES_TIMEOUT = 60 * 60 * 24
+
+_WORD_RE = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+STOP_WORDS = frozenset(
+    """
+    about after again all also and any are because been before being but can could
+    did does doing down each few for from further had has have having her here hers
+    him his how into its itself just more most not now off once only other our ours
+    out over own same she should some such than that the their theirs them then there
+    these they this those through too under until very was were what when where which
+    while who whom why will with would you your yours
+    """.split()
+)
+
+
+def tokenize(text: str) -> list:
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def max_document_frequency(size: int) -> float:
+    return max(2, MAX_DOCUMENT_FREQUENCY * size)
+
+
+def term_counts(title: str, body_text: str) -> Counter:
+    counts = Counter(tokenize(body_text))
+    for word in tokenize(title):
+        counts[word] += TITLE_BOOST
+    return counts
+
+
+class Corpus:
+    """TF-IDF vectors and tag sets for the candidate posts.
+
+    ``frequencies`` is ``(size, document_frequency)`` of the whole corpus when
+    ``rows`` are only part of it; by default they are counted from ``rows``.
+    """
+
+    def __init__(self, rows, frequencies=None):
+        # rows: iterable of (post_id, title, body_text, tag_ids)
+        counts_by_post = {}
+        self.tags = {}
+        counted = Counter()
+        for post_id, title, body_text, tag_ids in rows:
+            counts_by_post[post_id] = term_counts(title, body_text)
+            counted.update(counts_by_post[post_id].keys())
+            self.tags[post_id] = frozenset(tag_ids)
+
+        if frequencies is None:
+            frequencies = (len(counts_by_post), counted)
+        self.size, self.document_frequency = frequencies
+        max_df = max_document_frequency(self.size)
+        idf = {}
+        for term, count in counted.items():
+            df = max(self.document_frequency.get(term, 0), count)
+            if df <= max_df:
+                idf[term] = math.log((self.size + 1) / (df + 1)) + 1
+
+        self.vectors = {}
+        self.term_index = defaultdict(list)
+        self.tag_index = defaultdict(list)
+        for post_id, counts in counts_by_post.items():
+            vector = {
+                term: (1 + math.log(count)) * idf[term]
+                for term, count in counts.items()
+                if term in idf
+            }
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            if norm:
+                vector = {term: weight / norm for term, weight in vector.items()}
+            self.vectors[post_id] = vector
+            for term, weight in vector.items():
+                self.term_index[term].append((post_id, weight))
+        for post_id, tag_ids in self.tags.items():
+            for tag_id in tag_ids:
+                self.tag_index[tag_id].append(post_id)
+
+    def scores(self, post_id) -> dict:
+        """Similarity of ``post_id`` to every other post sharing a term or tag."""
+        text = defaultdict(float)
+        for term, weight in self.vectors.get(post_id, {}).items():
+            for other_id, other_weight in self.term_index[term]:
+                text[other_id] += weight * other_weight
+
+        tags = self.tags.get(post_id, frozenset())
+        shared = Counter()
+        for tag_id in tags:
+            shared.update(self.tag_index[tag_id])
+
+        scores = {}
+        for other_id in set(text) | set(shared):
+            if other_id == post_id:
+                continue
+            union = len(tags | self.tags[other_id])
+            jaccard = shared[other_id] / union if union else 0.0
+            scores[other_id] = TAG_WEIGHT * jaccard + TEXT_WEIGHT * text.get(other_id, 0.0)
+        return scores
+
+
+def top_neighbours(scores: dict, limit: int = NEIGHBOURS) -> list:
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return [(post_id, score) for post_id, score in ranked[:limit] if score > 0]
+
+
+def candidate_posts():
+    return Post.objects.filter(status="published")
+
+
+def _chunks(items, size: int = 500):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _rows(posts):
+    tag_ids = defaultdict(list)
+    for post_id, tag_id in Post.tags.through.objects.filter(post__in=posts).values_list(
+        "post_id", "tag_id"
+    ):
+        tag_ids[post_id].append(tag_id)
+    for post_id, title, body_text in posts.values_list("pk", "title", "body_text").iterator(
+        chunk_size=1000
+    ):
+        yield post_id, title, body_text, tag_ids[post_id]
+
+
+def load_corpus() -> Corpus:
+    corpus = Corpus(_rows(candidate_posts()))
+    cache.set(
+        FREQUENCIES_KEY, (corpus.size, corpus.document_frequency), FREQUENCIES_TIMEOUT
+    )
+    return corpus
+
+
+def load_neighbourhood(post_ids, frequencies) -> Corpus:
+    """``post_ids`` and every published post sharing a scored term or tag with them."""
+    posts = candidate_posts()
+    size, document_frequency = frequencies
+    max_df = max_document_frequency(size)
+    terms = set()
+    for title, body_text in posts.filter(pk__in=post_ids).values_list("title", "body_text"):
+        counts = term_counts(title, body_text)
+        terms.update(term for term in counts if document_frequency.get(term, 0) <= max_df)
+    tagged = Post.tags.through.objects.filter(
+        tag_id__in=Post.tags.through.objects.filter(post_id__in=post_ids).values("tag_id")
+    )
+    ids = set(post_ids)
+    ids.update(posts.filter(pk__in=tagged.values("post_id")).values_list("pk", flat=True))
+    for words in _chunks(sorted(terms), 200):
+        ids.update(posts_with_any_word(posts, words).values_list("pk", flat=True))
+    rows = (row for chunk in _chunks(sorted(ids)) for row in _rows(posts.filter(pk__in=chunk)))
+    return Corpus(rows, frequencies)
+
+
+def _purge_pages(post_ids) -> None:
+    pagecache.purge(*(f"post:{post_id}" for post_id in post_ids))
+
+
+def _write(neighbours_by_post: dict) -> int:
+    links = [
+        RelatedPost(post_id=post_id, related_id=related_id, score=score, rank=rank)
+        for post_id, neighbours in neighbours_by_post.items()
+        for rank, (related_id, score) in enumerate(neighbours)
+    ]
+    changed = []
+    with transaction.atomic():
+        for post_ids in _chunks(neighbours_by_post):
+            current = defaultdict(list)
+            for post_id, related_id in (
+                RelatedPost.objects.filter(post_id__in=post_ids)
+                .order_by("post_id", "rank")
+                .values_list("post_id", "related_id")
+            ):
+                current[post_id].append(related_id)
+            changed += [
+                post_id
+                for post_id in post_ids
+                if current[post_id] != [related_id for related_id, _ in neighbours_by_post[post_id]]
+            ]
+            RelatedPost.objects.filter(post_id__in=post_ids).delete()
+        RelatedPost.objects.bulk_create(links, batch_size=1000)
+    # Only the order of the list is shown, so score changes keep the pages.
+    _purge_pages(changed)
+    return len(links)
+
+
+def rebuild_related_posts(batch_size: int = 500) -> int:
+    """Recompute the neighbours of every published post. Returns links written."""
+    corpus = load_corpus()
+    total = 0
+    batch = {}
+    for post_id in corpus.vectors:
+        batch[post_id] = top_neighbours(corpus.scores(post_id))
+        if len(batch) >= batch_size:
+            total += _write(batch)
+            batch = {}
+    total += _write(batch)
+    # load_corpus() cached the frequencies refresh_related_posts() scores with.
+    # Posts that are no longer published keep no stale neighbour lists.
+    RelatedPost.objects.exclude(post__in=candidate_posts()).delete()
+    return total
+
+
+def refresh_related_posts(post_ids) -> int:
+    """Recompute the neighbours of ``post_ids`` and merge them into their peers' lists."""
+    post_ids = set(post_ids)
+    published = set(candidate_posts().filter(pk__in=post_ids).values_list("pk", flat=True))
+    # A changed post may no longer be similar to the posts listing it, and
+    # would then never show up in reverse_scores below: recompute their lists.
+    holders = set(
+        candidate_posts()
+        .filter(related_links__related_id__in=post_ids)
+        .values_list("pk", flat=True)
+    )
+    targets = published | holders
+    updates = {}
+    gone = post_ids - published
+    if gone:
+        # Unpublished or deleted: drop them from everyone's list.
+        links = RelatedPost.objects.filter(related_id__in=gone)
+        _purge_pages(set(links.values_list("post_id", flat=True)))
+        links.delete()
+        updates.update((post_id, []) for post_id in gone)
+    frequencies = cache.get(FREQUENCIES_KEY)
+    if frequencies is None:
+        corpus = load_corpus()
+    else:
+        corpus = load_neighbourhood(targets, frequencies)
+    reverse_scores = defaultdict(dict)
+    for post_id in targets:
+        scores = corpus.scores(post_id)
+        updates[post_id] = top_neighbours(scores)
+        if post_id not in published:
+            continue
+        for other_id, score in scores.items():
+            if other_id not in targets:
+                reverse_scores[other_id][post_id] = score
+
+    existing = defaultdict(dict)
+    for peer_ids in _chunks(reverse_scores):
+        for post_id, related_id, score in RelatedPost.objects.filter(
+            post_id__in=peer_ids
+        ).values_list("post_id", "related_id", "score"):
+            existing[post_id][related_id] = score
+    for other_id, new_scores in reverse_scores.items():
+        merged = {
+            related_id: score
+            for related_id, score in existing[other_id].items()
+            if related_id not in post_ids
+        }
+        merged.update(new_scores)
+        neighbours = top_neighbours(merged)
+        if [related_id for related_id, _ in neighbours] != list(existing[other_id]):
+            updates[other_id] = neighbours
+    return _write(updates)
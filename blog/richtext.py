@@ -0,0 +1,279 @@
+"""Sanitize CKEditor HTML and pre-render it for the post page.
+
+``render_content(html, image_variants)`` runs when a post is saved, and again
+when ``blog.images`` has generated an image's derivatives. It returns
+``(html, toc)``, which are stored on ``Post.content_html`` and ``Post.toc``, so
+the post page outputs a finished string instead of rewriting the editor's HTML
+on every render:
+
+* only an allowlist of tags and attributes survives. ``<script>``, ``<style>``,
+  embeds, comments, event handlers and ``javascript:`` URLs are dropped,
+  ``style`` keeps only the layout and colour properties CKEditor sets, and
+  unbalanced tags are closed so a post cannot break the page around it;
+* inline images get ``loading="lazy"`` and ``decoding="async"``. Once their
+  derivatives exist they also get width/height and a ``<picture>`` with
+  ``srcset``;
+* ``<h1>``-``<h4>`` get a unique ``id`` and a self-link, and are listed in the
+  table of contents as ``{"level": 2, "id": "h-...", "title": "..."}``;
+* CKEditor's named anchors (``<a id="x" name="x">``) keep a checked name as
+  ``a-x``. The prefixes keep post ids apart from the page's own (``#comments``),
+  and in-post links to ``#x`` or a heading's slug are rewritten to match;
+* links opening a new window get ``rel="noopener noreferrer"``.
+
+Changing these rules only affects posts saved afterwards; run
+``manage.py backfill_post_text`` to re-render the others.
+"""
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.utils.html import escape
+from django.utils.text import slugify
+
+from .images import picture_html, storage_name_from_url
+
+IMAGE_SIZES = "(min-width: 992px) 860px, 100vw"
+
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "caption", "cite", "code", "dd", "del", "div",
+    "dl", "dt", "em", "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr",
+    "i", "img", "ins", "kbd", "li", "mark", "ol", "p", "pre", "q", "s", "small", "span",
+    "strike", "strong", "sub", "sup", "table", "tbody", "td", "tfoot", "th", "thead",
+    "tr", "u", "ul",
+}
+VOID_TAGS = {"br", "hr", "img"}
+# Dropped together with everything inside them.
+DROPPED_TAGS = {
+    "script", "style", "iframe", "object", "embed", "noscript", "template", "svg",
+    "math", "head", "title", "textarea", "select", "button", "form",
+}
+ANCHORED_HEADINGS = {"h1", "h2", "h3", "h4"}
+HEADING_ID_PREFIX = "h-"
+ANCHOR_ID_PREFIX = "a-"
+
+GLOBAL_ATTRIBUTES = {"title", "dir", "lang", "style"}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "target", "id", "name"},
+    "img": {"src", "alt", "width", "height"},
+    "ol": {"start", "type"},
+    "li": {"value"},
+    "table": {"border", "cellpadding", "cellspacing"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan", "scope"},
+    "code": {"class"},
+    "pre": {"class"},
+}
+ALLOWED_STYLES = {
+    "background-color", "border", "border-style", "border-width", "color", "float",
+    "font-style", "font-weight", "height", "list-style-type", "margin", "margin-bottom",
+    "margin-left", "margin-right", "margin-top", "padding", "text-align",
+    "text-decoration", "vertical-align", "width",
+}
+
+_NUMBER_RE = re.compile(r"^\d{1,5}%?$")
+_VALUE_PATTERNS = {
+    "width": _NUMBER_RE,
+    "height": _NUMBER_RE,
+    "border": _NUMBER_RE,
+    "cellpadding": _NUMBER_RE,
+    "cellspacing": _NUMBER_RE,
+    "colspan": _NUMBER_RE,
+    "rowspan": _NUMBER_RE,
+    "start": _NUMBER_RE,
+    "value": _NUMBER_RE,
+    "type": re.compile(r"^[1aAiI]$"),
+    "scope": re.compile(r"^(row|col|rowgroup|colgroup)$"),
+    "target": re.compile(r"^_blank$"),
+    "class": re.compile(r"^language-[\w-]+$"),
+    "dir": re.compile(r"^(ltr|rtl|auto)$"),
+    "lang": re.compile(r"^[a-zA-Z]{2,3}(-[a-zA-Z0-9]{2,8})*$"),
+    "id": re.compile(r"^[\w-]{1,64}$"),
+    "name": re.compile(r"^[\w-]{1,64}$"),
+}
+_STYLE_VALUE_RE = re.compile(r"^[#\w\s.,%()+-]+$")
+_UNSAFE_STYLE_RE = re.compile(r"url|expression|image|\\", re.IGNORECASE)
+_URL_SCHEMES = {"href": {"", "http", "https", "mailto"}, "src": {"", "http", "https"}}
+_CONTROL_RE = re.compile(r"[\x00-\x20\x7f]+")
+
+
+def clean_url(value: str, attribute: str):
+    """``value`` if it is a relative or allowed-scheme URL, else ``None``."""
+    value = value.strip()
+    try:
+        scheme = urlsplit(_CONTROL_RE.sub("", value)).scheme.lower()
+    except ValueError:
+        return None
+    return value if scheme in _URL_SCHEMES[attribute] else None
+
+
+def clean_style(value: str):
+    declarations = []
+    for declaration in value.split(";"):
+        name, _, style = declaration.partition(":")
+        name, style = name.strip().lower(), style.strip()
+        if (
+            name in ALLOWED_STYLES
+            and _STYLE_VALUE_RE.match(style)
+            and not _UNSAFE_STYLE_RE.search(style)
+        ):
+            declarations.append(f"{name}: {style}")
+    return "; ".join(declarations) or None
+
+
+def clean_attributes(tag: str, attrs) -> dict:
+    allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+    cleaned = {}
+    for name, value in attrs:
+        name = name.lower()
+        if name not in allowed or value is None:
+            continue
+        if name in _URL_SCHEMES:
+            value = clean_url(value, name)
+        elif name == "style":
+            value = clean_style(value)
+        elif name in _VALUE_PATTERNS and not _VALUE_PATTERNS[name].match(value.strip()):
+            value = None
+        if value is not None:
+            cleaned[name] = value.strip() if name != "alt" else value
+    return cleaned
+
+
+def start_tag(tag: str, attributes: dict) -> str:
+    return "<{}{}>".format(
+        tag, "".join(f' {name}="{escape(value)}"' for name, value in attributes.items())
+    )
+
+
+class ContentRenderer(HTMLParser):
+    """Re-serialize an HTML fragment through the allowlist, rewriting as it goes."""
+
+    def __init__(self, image_variants=None):
+        super().__init__(convert_charrefs=True)
+        self.image_variants = image_variants or {}
+        self.output = []
+        self.open_tags = []
+        self.toc = []
+        self.ids = set()
+        self.targets = {}  # fragment as written -> the id it now has
+        self.links = []  # (output index, attributes) of in-post "#..." links
+        self.skipping = None  # (tag, depth) while inside a dropped element
+        self.heading = None  # (tag, output index, attributes, text) while inside one
+
+    def render(self, html: str):
+        self.feed(html or "")
+        self.close()
+        while self.open_tags:
+            self.end(self.open_tags[-1])
+        for index, attributes in self.links:
+            target = self.targets.get(attributes["href"][1:])
+            if target:
+                attributes["href"] = f"#{target}"
+                self.output[index] = start_tag("a", attributes)
+        return "".join(self.output), self.toc
+
+    def handle_starttag(self, tag, attrs):
+        if self.skipping:
+            if tag == self.skipping[0]:
+                self.skipping = (tag, self.skipping[1] + 1)
+            return
+        if tag in DROPPED_TAGS:
+            self.skipping = (tag, 1)
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+        attributes = clean_attributes(tag, attrs)
+        if tag == "img":
+            self.image(attributes)
+            return
+        if tag == "a":
+            self.link(attributes)
+        if tag in VOID_TAGS:
+            self.output.append(start_tag(tag, attributes))
+            return
+        if tag in ANCHORED_HEADINGS and self.heading is None:
+            # The id comes from the heading's text: fill the tag in at its end.
+            self.heading = (tag, len(self.output), attributes, [])
+            self.output.append("")
+        else:
+            self.output.append(start_tag(tag, attributes))
+        self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.skipping:
+            if tag == self.skipping[0]:
+                depth = self.skipping[1] - 1
+                self.skipping = (tag, depth) if depth else None
+            return
+        if tag not in self.open_tags:
+            return
+        while self.open_tags:
+            if self.end(self.open_tags[-1]) == tag:
+                break
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        if self.heading is not None:
+            self.heading[3].append(data)
+        self.output.append(escape(data))
+
+    def end(self, tag) -> str:
+        self.open_tags.pop()
+        if self.heading is not None and tag == self.heading[0]:
+            self.finish_heading()
+        self.output.append(f"</{tag}>")
+        return tag
+
+    def finish_heading(self):
+        tag, index, attributes, text = self.heading
+        self.heading = None
+        title = " ".join("".join(text).split())
+        anchor = self.unique_id(HEADING_ID_PREFIX + (slugify(title) or "section"))
+        self.targets.setdefault(anchor[len(HEADING_ID_PREFIX):], anchor)
+        self.output[index] = start_tag(tag, {"id": anchor, **attributes})
+        self.output.append(
+            f'<a class="heading-anchor" href="#{anchor}" aria-label="Link to this section">#</a>'
+        )
+        self.toc.append({"level": int(tag[1]), "id": anchor, "title": title})
+
+    def unique_id(self, base: str) -> str:
+        anchor, number = base, 1
+        while anchor in self.ids:
+            number += 1
+            anchor = f"{base}-{number}"
+        self.ids.add(anchor)
+        return anchor
+
+    def link(self, attributes):
+        if attributes.get("target") == "_blank":
+            attributes["rel"] = "noopener noreferrer"
+        # CKEditor's Anchor button writes the same value to both.
+        name = attributes.pop("name", None) or attributes.pop("id", None)
+        attributes.pop("id", None)
+        if name:
+            anchor = self.unique_id(ANCHOR_ID_PREFIX + name)
+            self.targets.setdefault(name, anchor)
+            attributes["id"] = attributes["name"] = anchor
+        if attributes.get("href", "").startswith("#"):
+            # The target may come later in the post: fixed up in render().
+            self.links.append((len(self.output), attributes))
+
+    def image(self, attributes):
+        if "src" not in attributes:
+            return
+        attributes.setdefault("alt", "")
+        attributes["loading"] = "lazy"
+        attributes["decoding"] = "async"
+        entry = self.image_variants.get(storage_name_from_url(attributes["src"]))
+        tag = start_tag("img", attributes)
+        self.output.append(picture_html(tag, entry, IMAGE_SIZES) if entry else tag)
+
+
+def render_content(html: str, image_variants=None):
+    """Sanitized, ready-to-serve HTML for ``html`` and its table of contents."""
+    return ContentRenderer(image_variants).render(html)
@@ -0,0 +1,48 @@
+"""Scheduled publishing.
+
+A post saved as "published" with a future ``publish_date`` is stored as
+"scheduled" (see ``Post.resolve_status``), and a ``blog.publish_scheduled_posts``
+task is queued for that moment. The task saves every due post as "published"
+through the ORM, so the usual signals fire exactly as for a manual publish:
+counters, sidebar, search index, related posts and page-cache purges.
+
+Because posts only become "published" once they are live, public queries filter
+on ``status`` alone: no clock in the ``WHERE`` clause, so they match the partial
+indexes and cached pages stay valid until a post actually goes live.
+``manage.py publish_scheduled`` does the same from cron, as a safety net for a
+lost task.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import queue
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def due_posts():
+    return Post.objects.filter(status="scheduled", publish_date__lte=timezone.now())
+
+
+def publish_due_posts() -> int:
+    """Publish every scheduled post whose time has come; returns how many."""
+    published = 0
+    for pk in due_posts().order_by("publish_date").values_list("pk", flat=True):
+        with transaction.atomic():
+            # Locked and re-checked so two workers never publish the same post twice.
+            post = due_posts().select_for_update().filter(pk=pk).first()
+            if post is None:
+                continue
+            post.status = "published"
+            post.save(update_fields=["status", "updated_at"])
+        logger.info("Published scheduled post %s", post.slug)
+        published += 1
+    return published
+
+
+def schedule_publication(post) -> None:
+    """Queue the publishing task for when ``post`` is due."""
+    queue.enqueue("blog.publish_scheduled_posts", run_at=post.publish_date)
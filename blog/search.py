@@ -0,0 +1,285 @@
+"""Full-text search over posts.
+
+The index lives outside the ORM because neither backend can be expressed as a
+regular model:
+
+* SQLite uses an FTS5 virtual table (``blog_post_fts``) keyed by the post id.
+* PostgreSQL uses a ``tsvector`` column (``blog_post_search.document``) with a
+  GIN index.
+
+Any other database falls back to the original ``icontains`` scan so the views
+keep working, just without ranking.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .text import html_to_text
+
+FTS_TABLE = "blog_post_fts"
+PG_TABLE = "blog_post_search"
+PG_CONFIG = "english"
+
+# Column weights: title, body, category, tags.
+FTS_WEIGHTS = (10.0, 1.0, 4.0, 4.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_document(post) -> dict:
+    """Collect the searchable fields of ``post``."""
+    return {
+        "title": post.title,
+        "body": html_to_text(post.content),
+        "category": post.category.name if post.category_id else "",
+        "tags": " ".join(tag.name for tag in post.tags.all()),
+    }
+
+
+def build_fts_query(query: str) -> str:
+    """Turn free text into a safe FTS5 expression (prefix match on every word)."""
+    tokens = _TOKEN_RE.findall(query.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class SearchBackend:
+    vendor = None
+
+    def create_index(self, cursor) -> None:
+        pass
+
+    def drop_index(self, cursor) -> None:
+        pass
+
+    def index_posts(self, cursor, posts) -> None:
+        pass
+
+    def remove_posts(self, cursor, post_ids) -> None:
+        pass
+
+    def clear(self, cursor) -> None:
+        pass
+
+    def search(self, queryset, query: str):
+        return queryset.filter(
+            Q(title__icontains=query)
+            | Q(content__icontains=query)
+            | Q(category__name__icontains=query)
+            | Q(tags__name__icontains=query)
+        ).distinct()
+
+    def with_any_word(self, queryset, words):
+        condition = Q()
+        for word in words:
+            condition |= Q(title__icontains=word) | Q(body_text__icontains=word)
+        return queryset.filter(condition)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    vendor = "sqlite"
+
+    def create_index(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "title, body, category, tags, "
+            "tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+
+    def drop_index(self, cursor) -> None:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def index_posts(self, cursor, posts) -> None:
+        rows = []
+        for post in posts:
+            doc = search_document(post)
+            rows.append((post.pk, doc["title"], doc["body"], doc["category"], doc["tags"]))
+        if not rows:
+            return
+        self.remove_posts(cursor, [row[0] for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, body, category, tags) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+    def remove_posts(self, cursor, post_ids) -> None:
+        cursor.executemany(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+            [(pk,) for pk in post_ids],
+        )
+
+    def clear(self, cursor) -> None:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def search(self, queryset, query: str):
+        match = build_fts_query(query)
+        if not match:
+            return queryset.none()
+        post_table = queryset.model._meta.db_table
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        # bm25() is "lower is better"; negate it so every backend sorts the
+        # same way (descending rank).
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "{post_table}"."id"',
+            (match,),
+        )
+        matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+    def with_any_word(self, queryset, words):
+        match = " OR ".join(f'"{token}"' for word in words for token in _TOKEN_RE.findall(word))
+        if not match:
+            return queryset.none()
+        matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        return queryset.filter(pk__in=matches)
+
+
+class PostgresSearchBackend(SearchBackend):
+    vendor = "postgresql"
+
+    def create_index(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            "post_id bigint PRIMARY KEY REFERENCES blog_post (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_idx "
+            f"ON {PG_TABLE} USING GIN (document)"
+        )
+
+    def drop_index(self, cursor) -> None:
+        cursor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+    def index_posts(self, cursor, posts) -> None:
+        rows = []
+        for post in posts:
+            doc = search_document(post)
+            rows.append((post.pk, doc["title"], doc["category"], doc["tags"], doc["body"]))
+        if not rows:
+            return
+        cursor.executemany(
+            f"INSERT INTO {PG_TABLE} (post_id, document) VALUES (%s, "
+            f"setweight(to_tsvector('{PG_CONFIG}', %s), 'A') || "
+            f"setweight(to_tsvector('{PG_CONFIG}', %s), 'B') || "
+            f"setweight(to_tsvector('{PG_CONFIG}', %s), 'B') || "
+            f"setweight(to_tsvector('{PG_CONFIG}', %s), 'C')) "
+            "ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document",
+            rows,
+        )
+
+    def remove_posts(self, cursor, post_ids) -> None:
+        cursor.execute(f"DELETE FROM {PG_TABLE} WHERE post_id = ANY(%s)", (list(post_ids),))
+
+    def clear(self, cursor) -> None:
+        cursor.execute(f"TRUNCATE {PG_TABLE}")
+
+    def search(self, queryset, query: str):
+        if not query.strip():
+            return queryset.none()
+        post_table = queryset.model._meta.db_table
+        tsquery = f"websearch_to_tsquery('{PG_CONFIG}', %s)"
+        rank = RawSQL(
+            f"SELECT ts_rank(document, {tsquery}) FROM {PG_TABLE} "
+            f'WHERE {PG_TABLE}.post_id = "{post_table}"."id"',
+            (query,),
+        )
+        matches = RawSQL(
+            f"SELECT post_id FROM {PG_TABLE} WHERE document @@ {tsquery}",
+            (query,),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+    def with_any_word(self, queryset, words):
+        tokens = [token for word in words for token in _TOKEN_RE.findall(word)]
+        if not tokens:
+            return queryset.none()
+        matches = RawSQL(
+            f"SELECT post_id FROM {PG_TABLE} "
+            f"WHERE document @@ to_tsquery('{PG_CONFIG}', %s)",
+            (" | ".join(tokens),),
+        )
+        return queryset.filter(pk__in=matches)
+
+
+_BACKENDS = {
+    backend.vendor: backend
+    for backend in (SQLiteSearchBackend(), PostgresSearchBackend())
+}
+
+
+def get_backend(using=None) -> SearchBackend:
+    vendor = (using or connection).vendor
+    return _BACKENDS.get(vendor, SearchBackend())
+
+
+def is_ranked() -> bool:
+    """Whether search results carry a ``search_rank`` annotation."""
+    return get_backend().vendor is not None
+
+
+def search_posts(queryset, query: str):
+    """Filter ``queryset`` down to posts matching ``query``.
+
+    On indexed backends the results are annotated with ``search_rank``
+    (higher is better).
+    """
+    return get_backend().search(queryset, query)
+
+
+def posts_with_any_word(queryset, words):
+    """Filter ``queryset`` down to posts containing at least one of ``words``.
+
+    Stemming makes this a superset on indexed backends.
+    """
+    return get_backend().with_any_word(queryset, words)
+
+
+def _with_search_relations(posts):
+    return posts.select_related("category").prefetch_related("tags")
+
+
+def index_posts(posts) -> None:
+    """(Re)index the given posts. ``posts`` may be a queryset or an iterable."""
+    backend = get_backend()
+    if backend.vendor is None:
+        return
+    if hasattr(posts, "select_related"):
+        posts = _with_search_relations(posts)
+    with connection.cursor() as cursor:
+        backend.index_posts(cursor, posts)
+
+
+def remove_posts(post_ids) -> None:
+    backend = get_backend()
+    post_ids = list(post_ids)
+    if backend.vendor is None or not post_ids:
+        return
+    with connection.cursor() as cursor:
+        backend.remove_posts(cursor, post_ids)
+
+
+def rebuild_index(batch_size: int = 500) -> int:
+    """Drop every index entry and reindex all posts. Returns the number indexed."""
+    from .models import Post
+
+    backend = get_backend()
+    if backend.vendor is None:
+        return 0
+    with connection.cursor() as cursor:
+        backend.clear(cursor)
+    posts = _with_search_relations(Post.objects.order_by("pk"))
+    total = 0
+    batch = []
+    for post in posts.iterator(chunk_size=batch_size):
+        batch.append(post)
+        if len(batch) >= batch_size:
+            index_posts(batch)
+            total += len(batch)
+            batch = []
+    index_posts(batch)
+    return total + len(batch)
@@ -0,0 +1,60 @@
+"""Cached categories/tags sidebar shared by every post listing.
+
+The sidebar context and its rendered HTML are stored together under one key,
+tagged with a version number kept under a second key. Both are read with a
+single ``get_many`` round trip; writes that change the sidebar call
+``bump_version`` so the next reader re-renders it.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .models import Category, Tag
+
+VERSION_KEY = "blog:sidebar:version"
+SIDEBAR_KEY = "blog:sidebar"
+TEMPLATE_NAME = "blog/includes/sidebar.html"
+
+
+def get_timeout() -> int:
+    return getattr(settings, "BLOG_SIDEBAR_CACHE_TIMEOUT", 60 * 60)
+
+
+def bump_version() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Missing (evicted or never set): any fresh value invalidates
+        # entries tagged with an older one.
+        cache.set(VERSION_KEY, 1, None)
+        cache.delete(SIDEBAR_KEY)
+
+
+def build_sidebar() -> dict:
+    context = {
+        "categories": list(Category.objects.values("name", "slug", "published_post_count")),
+        "tags": list(
+            Tag.objects.order_by("-published_post_count", "name").values(
+                "name", "slug", "published_post_count"
+            )
+        ),
+    }
+    context["html"] = render_to_string(TEMPLATE_NAME, context)
+    return context
+
+
+def get_sidebar() -> dict:
+    """Return ``{"categories", "tags", "html"}`` for the sidebar."""
+    cached = cache.get_many([VERSION_KEY, SIDEBAR_KEY])
+    version = cached.get(VERSION_KEY)
+    entry = cached.get(SIDEBAR_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    if entry is None or entry["version"] != version:
+        entry = build_sidebar()
+        entry["version"] = version
+        cache.set(SIDEBAR_KEY, entry, get_timeout())
+    entry["html"] = mark_safe(entry["html"])
+    return entry
@@ -0,0 +1,263 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import counters, images, pagecache, queue, scheduling, search, sidebar
+from .models import Category, Comment, Post, Tag
+
+
+def _sidebar_changed() -> None:
+    sidebar.bump_version()
+    pagecache.purge("sidebar")
+
+
+def _changed_relation_ids(instance, action, pk_set):
+    """Ids on the other side of a ``Post.tags`` change (tags, or posts if reversed)."""
+    if action == "post_clear":
+        return list(getattr(instance, "_cleared_relation_ids", ()))
+    return list(pk_set or ())
+
+
+# State captured before writes ---------------------------------------------
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if raw or instance._state.adding:
+        return
+    instance._previous_state = (
+        Post.objects.filter(pk=instance.pk)
+        .values("status", "publish_date", "category_id")
+        .first()
+    )
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    instance._previous_tag_ids = list(instance.tags.values_list("pk", flat=True))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def remember_cleared_relations(sender, instance, action, reverse, **kwargs):
+    if action != "pre_clear":
+        return
+    related = instance.posts if reverse else instance.tags
+    instance._cleared_relation_ids = list(related.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Tag)
+def remember_posts_before_delete(sender, instance, **kwargs):
+    instance._affected_post_ids = list(instance.posts.values_list("pk", flat=True))
+
+
+# Search index -------------------------------------------------------------
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_posts(Post.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    post_ids = _changed_relation_ids(instance, action, pk_set) if reverse else [instance.pk]
+    search.index_posts(Post.objects.filter(pk__in=post_ids))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_posts(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    search.index_posts(Post.objects.filter(category=instance))
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tag_posts(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    search.index_posts(Post.objects.filter(tags=instance))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def reindex_posts_after_delete(sender, instance, **kwargs):
+    search.index_posts(Post.objects.filter(pk__in=getattr(instance, "_affected_post_ids", ())))
+
+
+# Published-post counters ----------------------------------------------------
+
+
+@receiver(post_save, sender=Post)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None)
+    was_counted = previous is not None and counters.counts_as_published(previous["status"])
+    old_category_id = previous["category_id"] if previous else None
+    now_counted = counters.is_counted(instance)
+    if was_counted != now_counted or (now_counted and old_category_id != instance.category_id):
+        counters.recount_categories({old_category_id, instance.category_id})
+        if not created and was_counted != now_counted:
+            counters.recount_tags(instance.tags.values_list("pk", flat=True))
+        _sidebar_changed()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        counters.recount_tags([instance.pk])
+    elif counters.is_counted(instance):
+        counters.recount_tags(_changed_relation_ids(instance, action, pk_set))
+    else:
+        return
+    _sidebar_changed()
+
+
+@receiver(post_delete, sender=Post)
+def update_counters_on_delete(sender, instance, **kwargs):
+    if not counters.is_counted(instance):
+        return
+    counters.recount_categories([instance.category_id])
+    counters.recount_tags(getattr(instance, "_previous_tag_ids", ()))
+    _sidebar_changed()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def update_comment_count(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.recount_comments([instance.post_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def invalidate_sidebar(sender, raw=False, **kwargs):
+    if not raw:
+        _sidebar_changed()
+
+
+# Page cache -----------------------------------------------------------------
+
+
+@receiver(post_save, sender=Post)
+def purge_saved_post_pages(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None) or {}
+    category_ids = {previous.get("category_id"), instance.category_id} - {None}
+    tag_ids = [] if created else instance.tags.values_list("pk", flat=True)
+    pagecache.purge(
+        "posts",
+        f"post:{instance.pk}",
+        *(f"category:{pk}" for pk in category_ids),
+        *(f"tag:{pk}" for pk in tag_ids),
+    )
+
+
+@receiver(post_delete, sender=Post)
+def purge_deleted_post_pages(sender, instance, **kwargs):
+    dependencies = ["posts", f"post:{instance.pk}"]
+    if instance.category_id:
+        dependencies.append(f"category:{instance.category_id}")
+    dependencies += [f"tag:{pk}" for pk in getattr(instance, "_previous_tag_ids", ())]
+    pagecache.purge(*dependencies)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def purge_post_tag_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    related_ids = _changed_relation_ids(instance, action, pk_set)
+    if reverse:
+        post_ids, tag_ids = related_ids, [instance.pk]
+    else:
+        post_ids, tag_ids = [instance.pk], related_ids
+    pagecache.purge(
+        "posts",
+        *(f"post:{pk}" for pk in post_ids),
+        *(f"tag:{pk}" for pk in tag_ids),
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_category_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pagecache.purge(f"category:{instance.pk}")
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_tag_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    post_ids = getattr(instance, "_affected_post_ids", None)
+    if post_ids is None:
+        post_ids = instance.posts.values_list("pk", flat=True)
+    pagecache.purge(f"tag:{instance.pk}", *(f"post:{pk}" for pk in post_ids))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # List pages show the comment count too.
+    post = Post.objects.filter(pk=instance.post_id).only("category_id").first()
+    dependencies = ["posts", f"post:{instance.post_id}"]
+    if post is not None:
+        if post.category_id:
+            dependencies.append(f"category:{post.category_id}")
+        dependencies += [f"tag:{pk}" for pk in post.tags.values_list("pk", flat=True)]
+    pagecache.purge(*dependencies)
+
+
+# Background work ------------------------------------------------------------
+
+
+@receiver(post_save, sender=Post)
+def schedule_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw and images.needs_processing(instance):
+        queue.enqueue("blog.process_post_images", instance.pk, dedupe=True)
+
+
+@receiver(post_save, sender=Post)
+def schedule_related_posts_refresh(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_state", None)
+    was_counted = previous is not None and counters.counts_as_published(previous["status"])
+    if was_counted or counters.is_counted(instance):
+        queue.enqueue("blog.refresh_related_posts", instance.pk, dedupe=True)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def schedule_related_posts_refresh_for_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    post_ids = _changed_relation_ids(instance, action, pk_set) if reverse else [instance.pk]
+    for post_id in post_ids:
+        queue.enqueue("blog.refresh_related_posts", post_id, dedupe=True)
+
+
+@receiver(post_save, sender=Post)
+def schedule_publication(sender, instance, raw=False, **kwargs):
+    if raw or instance.status != "scheduled":
+        return
+    previous = getattr(instance, "_previous_state", None)
+    if previous is None or previous["status"] != "scheduled" or previous["publish_date"] != instance.publish_date:
+        scheduling.schedule_publication(instance)
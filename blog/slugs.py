@@ -0,0 +1,109 @@
+"""Unique slug allocation for posts, categories and tags.
+
+The next free suffix is found with one query: the slug column's unique index
+narrows the candidates to the ``<base>`` prefix (``taken_slugs``) and the
+longest (i.e. highest numbered) ``<base>-<n>`` wins, so saving the hundredth "Weekly update" costs
+the same as saving the first. Two writers can still pick the same slug at the
+same time; the loser hits the unique constraint, and ``save_with_unique_slug``
+rolls back to a savepoint, allocates again and retries.
+"""
+import re
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+MAX_ATTEMPTS = 5
+
+
+def _max_length(model) -> int:
+    return model._meta.get_field("slug").max_length
+
+
+def _with_suffix(base: str, number: int, max_length: int) -> str:
+    suffix = f"-{number}"
+    return base[: max_length - len(suffix)].rstrip("-") + suffix
+
+
+def _base_slug(model, value: str) -> str:
+    return slugify(value)[: _max_length(model)].rstrip("-") or model._meta.model_name
+
+
+def taken_slugs(model, base: str):
+    """``<base>`` and the ``<base>-<n>`` slugs of ``model``."""
+    queryset = model.objects.all()
+    if connections[queryset.db].vendor == "sqlite":
+        # SQLite's LIKE is case-insensitive, so startswith cannot use the
+        # index. Of the characters slugify() emits only "-" sorts below ".".
+        queryset = queryset.filter(slug__gte=base, slug__lt=f"{base}.")
+    else:
+        # PostgreSQL serves LIKE 'base%' from the slug's varchar_pattern_ops
+        # index; a range would depend on the column's collation.
+        queryset = queryset.filter(slug__startswith=base)
+    return queryset.filter(slug__regex=rf"^{re.escape(base)}(-[0-9]+)?$")
+
+
+def allocate_slug(model, value: str, exclude_pk=None) -> str:
+    """Return a slug for ``value`` that is not yet used by ``model``."""
+    max_length = _max_length(model)
+    base = _base_slug(model, value)
+    taken = taken_slugs(model, base)
+    if exclude_pk is not None:
+        taken = taken.exclude(pk=exclude_pk)
+    highest = taken.order_by(Length("slug").desc(), "-slug").values_list("slug", flat=True).first()
+    if highest is None:
+        return base
+    if highest == base:
+        return _with_suffix(base, 1, max_length)
+    return _with_suffix(base, int(highest.rsplit("-", 1)[1]) + 1, max_length)
+
+
+def allocate_slugs(model, values, reserved=()) -> list:
+    """Return a distinct unused slug for each of ``values``, for bulk inserts.
+
+    Costs one query per distinct base slug; repeats within ``values`` are
+    numbered in memory. Slugs in ``reserved`` are treated as taken.
+    """
+    max_length = _max_length(model)
+    taken = set(reserved)
+    next_number = {}
+    slugs = []
+    for value in values:
+        base = _base_slug(model, value)
+        if base not in next_number:
+            first = allocate_slug(model, value)
+            next_number[base] = 0 if first == base else int(first.rsplit("-", 1)[1])
+        while True:
+            number = next_number[base]
+            next_number[base] = number + 1
+            slug = base if number == 0 else _with_suffix(base, number, max_length)
+            if slug not in taken:
+                break
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _slug_taken(instance) -> bool:
+    return type(instance).objects.filter(slug=instance.slug).exclude(pk=instance.pk).exists()
+
+
+def save_with_unique_slug(instance, value: str, save, *args, **kwargs) -> None:
+    """Fill in ``instance.slug`` from ``value`` if it is blank, then ``save()``.
+
+    Slugs the caller chose are saved as-is; only generated ones are retried.
+    """
+    if instance.slug:
+        save(*args, **kwargs)
+        return
+    model = type(instance)
+    for attempt in range(MAX_ATTEMPTS):
+        instance.slug = allocate_slug(model, value, exclude_pk=instance.pk)
+        try:
+            with transaction.atomic():
+                save(*args, **kwargs)
+            return
+        except IntegrityError:
+            if attempt == MAX_ATTEMPTS - 1 or not _slug_taken(instance):
+                instance.slug = ""
+                raise
@@ -0,0 +1,163 @@
+"""What ``collectstatic`` collects, and how it is written out for production.
+
+Three steps run when ``build.sh`` calls ``collectstatic``:
+
+* ``PrunedAppDirectoriesFinder`` leaves out the parts of django-ckeditor's
+  static tree the editor never loads: plugins that are not part of the bundled
+  ``ckeditor.js`` build, translations other than the site language (the widget
+  always asks for ``LANGUAGE_CODE``), the unused skin, samples and docs. That
+  is most of its 1,250 files. Only listing is filtered, so ``findstatic`` and
+  ``runserver`` still find every file;
+* ``StaticAssetStorage`` minifies the project's own stylesheets (those under
+  ``STATICFILES_DIRS``; third-party files ship minified already);
+* WhiteNoise's ``CompressedManifestStaticFilesStorage`` then writes a copy of
+  each file with a content hash in its name, which ``{% static %}`` links to
+  and WhiteNoise serves with a one-year ``immutable`` ``Cache-Control``, plus
+  gzip and (with the ``Brotli`` package) Brotli versions for clients that
+  accept them. Unhashed copies are kept: CKEditor loads its plugins by path.
+
+Enabling a CKEditor plugin outside the bundled build means removing it from
+``UNUSED_CKEDITOR_PLUGINS``.
+
+``StaticFilesMiddleware`` serves the result. It is WhiteNoise's middleware made
+async-capable: WhiteNoise's own is sync-only, which under ASGI makes Django run
+every request, static or not, through its single sync thread.
+"""
+import re
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.finders import AppDirectoriesFinder
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+CKEDITOR_ROOT = "ckeditor/ckeditor/"
+# Shipped in plugins/ but not in the plugin list built into ckeditor.js.
+UNUSED_CKEDITOR_PLUGINS = (
+    "adobeair", "autoembed", "autogrow", "autolink", "bbcode", "codesnippet",
+    "codesnippetgeshi", "devtools", "divarea", "docprops", "embed", "embedbase",
+    "embedsemantic", "flash", "iframedialog", "image2", "mathjax", "placeholder",
+    "sharedspace", "sourcedialog", "stylesheetparser", "tableresize", "uicolor", "wsc",
+)
+UNUSED_CKEDITOR_FILES = re.compile(
+    r"^(?:"
+    rf"plugins/(?:{'|'.join(UNUSED_CKEDITOR_PLUGINS)})/"
+    r"|samples/|skins/moono/|adapters/"
+    r"|(?:CHANGES|README|SECURITY)\.md$|bender-runner\.config\.json$|build-config\.js$"
+    r")"
+)
+_LANGUAGE_FILE_RE = re.compile(r"(?:^|/)lang/([^/]+)$")
+
+_CSS_STRING_OR_COMMENT_RE = re.compile(
+    r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|/\*.*?\*/", re.DOTALL
+)
+_CSS_STRING_RE = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')")
+_CSS_PUNCTUATION_RE = re.compile(r"\s*([{};,])\s*")
+
+
+def is_pruned(path: str) -> bool:
+    """Whether ``collectstatic`` should skip the app static file at ``path``."""
+    if not path.startswith(CKEDITOR_ROOT):
+        return False
+    path = path[len(CKEDITOR_ROOT):]
+    language = _LANGUAGE_FILE_RE.search(path)
+    if language:
+        return language.group(1) != f"{settings.LANGUAGE_CODE.split('-')[0]}.js"
+    return bool(UNUSED_CKEDITOR_FILES.match(path))
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and the whitespace that does not change what ``css`` means."""
+    css = _CSS_STRING_OR_COMMENT_RE.sub(lambda match: match.group(1) or "", css)
+    parts = _CSS_STRING_RE.split(css)
+    for index in range(0, len(parts), 2):  # the odd parts are strings
+        part = " ".join(parts[index].split())
+        part = _CSS_PUNCTUATION_RE.sub(r"\1", part)
+        # Only after the colon: "a :hover" and "a:hover" are different selectors.
+        parts[index] = part.replace(": ", ":").replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def own_static_dirs() -> set:
+    return {
+        Path(entry[1] if isinstance(entry, (list, tuple)) else entry).resolve()
+        for entry in settings.STATICFILES_DIRS
+    }
+
+
+class PrunedAppDirectoriesFinder(AppDirectoriesFinder):
+    """``AppDirectoriesFinder`` that does not list the files ``is_pruned`` rejects."""
+
+    def list(self, ignore_patterns):
+        for path, storage in super().list(ignore_patterns):
+            if not is_pruned(path):
+                yield path, storage
+
+
+class StaticAssetStorage(CompressedManifestStaticFilesStorage):
+    """Minify the project's stylesheets, then fingerprint and compress everything."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = self.minify(paths)
+        yield from super().post_process(paths, dry_run, **options)
+
+    def minify(self, paths: dict) -> dict:
+        own = own_static_dirs()
+        paths = dict(paths)
+        for name, (storage, path) in list(paths.items()):
+            if not name.endswith(".css") or name.endswith(".min.css"):
+                continue
+            if Path(storage.location).resolve() not in own:
+                continue
+            with storage.open(path) as source:
+                css = source.read().decode()
+            # Replace the copy collectstatic made; hashing reads it from here.
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(minify_css(css).encode()))
+            paths[name] = (self, name)
+        return paths
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """``WhiteNoiseMiddleware`` with an async path for ASGI."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self.find_static_file(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        return await sync_to_async(self.serve_buffered, thread_sensitive=False)(static_file, request)
+
+    def find_static_file(self, path):
+        if self.autorefresh:
+            return self.find_file(path)
+        return self.files.get(path)
+
+    def serve_buffered(self, static_file, request):
+        """The file as a plain response: ASGI cannot stream a sync file iterator."""
+        streamed = self.serve(static_file, request)
+        try:
+            response = HttpResponse(b"".join(streamed.streaming_content), status=streamed.status_code)
+        finally:
+            streamed.close()
+        del response["Content-Type"]
+        for header, value in streamed.items():
+            response[header] = value
+        return response
@@ -0,0 +1,25 @@
+"""Background tasks run by ``manage.py run_worker``; see ``blog.queue``."""
+from .queue import task
+
+
+# Reads the uploads and writes the derivatives in MEDIA_ROOT, so it runs on the
+# machine that holds them; see render.yaml.
+@task(queue="media")
+def process_post_images(post_id: int) -> None:
+    from .images import process_post_images
+
+    process_post_images(post_id)
+
+
+@task()
+def refresh_related_posts(post_id: int) -> None:
+    from .related import refresh_related_posts
+
+    refresh_related_posts([post_id])
+
+
+@task()
+def publish_scheduled_posts() -> None:
+    from .scheduling import publish_due_posts
+
+    publish_due_posts()
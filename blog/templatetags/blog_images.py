@@ -0,0 +1,20 @@
+from django import template
+from django.utils.html import format_html
+
+from blog.images import picture_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, variants, sizes="100vw", alt="", css_class="", style=""):
+    """Render ``image`` (an ImageField file) as a ``<picture>`` with its derivatives."""
+    img = format_html(
+        '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy" decoding="async">',
+        image.url,
+        alt,
+        css_class,
+        style,
+    )
+    entry = (variants or {}).get(image.name)
+    return picture_html(img, entry, sizes) if entry else img
@@ -0,0 +1,40 @@
+"""Compile the project's templates before the first request.
+
+With the cached loader (see ``TEMPLATES`` in settings) each template is read and
+parsed once per process, on first use, so the first readers after a deploy
+pay for parsing ``base.html``, ``post_list.html`` and friends. ``wsgi.py`` and
+``asgi.py`` call ``warm_templates()`` as each worker boots so that cost is paid
+before it takes traffic. A template that fails to compile is logged and
+skipped: its page fails as it would have anyway, the rest of the site works.
+"""
+import logging
+from pathlib import Path
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+
+def project_templates(engine):
+    """Names of the templates under ``engine``'s ``DIRS``."""
+    for directory in engine.engine.dirs:
+        root = Path(directory)
+        for path in sorted(root.rglob("*.html")):
+            yield path.relative_to(root).as_posix()
+
+
+def warm_templates() -> int:
+    """Load every project template through the template engines; returns how many."""
+    compiled = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for name in project_templates(engine):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception("Cannot compile template %s", name)
+            else:
+                compiled += 1
+    return compiled
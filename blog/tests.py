@@ -1,9 +1,68 @@
-from django.contrib.auth.models import User
-from django.test import TestCase
+import asyncio
+import json
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.base import BaseHandler
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.template import engines
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from PIL import Image
 
-from .models import Category, Tag, Post, Comment
+from . import (
+    dbconnections,
+    images,
+    pagecache,
+    profiling,
+    queue,
+    related,
+    staticassets,
+    timing,
+    views,
+)
+from .benchmark import compare, run_benchmark
+from .fakedata import generate_records
+from .images import process_post_images
+from .models import Category, Tag, Post, Comment, RelatedPost, Task
+from .queryplans import check_plans, explain
+from .scheduling import publish_due_posts
+from .querylog import QueryBudgetMixin, QueryLog, QueryLogMiddleware, query_shape
+from .richtext import render_content
+from .slugs import allocate_slug, allocate_slugs, taken_slugs
+from .templating import project_templates, warm_templates
+from .transfer import ArchiveError, export_records, import_records, read_records, write_records
 
 
 class PostModelTests(TestCase):
@@ -33,6 +92,44 @@ class PostModelTests(TestCase):
         )
         self.assertFalse(post.is_published)
 
+    def test_duplicate_titles_get_numbered_slugs_in_one_query(self):
+        slugs = [
+            Post.objects.create(title="Weekly update", author=self.user, content="x").slug
+            for _ in range(3)
+        ]
+        self.assertEqual(slugs, ["weekly-update", "weekly-update-1", "weekly-update-2"])
+        for _ in range(8):
+            Post.objects.create(title="Weekly update", author=self.user, content="x")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(allocate_slug(Post, "Weekly update"), "weekly-update-11")
+        self.assertEqual(len(queries), 1)
+
+    def test_slug_collision_is_retried(self):
+        post = Post(title="Race", author=self.user, content="x")
+        with mock.patch("blog.slugs.allocate_slug", side_effect=["race", "race-1"]):
+            Post.objects.create(title="Other", slug="race", author=self.user, content="x")
+            post.save()
+        self.assertEqual(post.slug, "race-1")
+
+    def test_category_and_tag_slugs_are_unique(self):
+        self.assertEqual(Category.objects.create(name="C++").slug, "c")
+        self.assertEqual(Category.objects.create(name="C").slug, "c-1")
+        self.assertEqual(Tag.objects.create(name="!!!").slug, "tag")
+
+    def test_slug_lookup_searches_the_index(self):
+        plan = explain(taken_slugs(Post, "weekly-update").values_list("slug", flat=True))
+        if connection.vendor == "sqlite":
+            self.assertIn("(slug>? AND slug<?)", plan)
+        else:
+            self.assertIn("Index", plan)
+
+    def test_bulk_slugs_number_repeats_in_memory(self):
+        Post.objects.create(title="Weekly update", author=self.user, content="x")
+        with CaptureQueriesContext(connection) as queries:
+            slugs = allocate_slugs(Post, ["Weekly update", "Weekly update", "Other"])
+        self.assertEqual(slugs, ["weekly-update-1", "weekly-update-2", "other"])
+        self.assertEqual(len(queries), 2)
+
 
 class CommentModelTests(TestCase):
     def setUp(self) -> None:
@@ -57,8 +154,54 @@ class CommentModelTests(TestCase):
         self.assertEqual(comment.content, "Nice post!")
 
 
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class CommentTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="reader", password="testpass123")
+        self.post = Post.objects.create(
+            title="Busy post",
+            author=self.user,
+            content="<p>Text</p>",
+            status="published",
+            publish_date=timezone.now() - timedelta(hours=1),
+        )
+
+    def test_comment_count_tracks_active_comments(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content="First")
+        Comment.objects.create(post=self.post, author=self.user, content="Second")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+        comment.active = False
+        comment.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        response = self.client.get(reverse("blog:post_list"))
+        self.assertContains(response, 'title="1 comment"')
+
+    def test_comments_are_paginated(self):
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, content=f"Comment {n}") for n in range(55)
+        )
+        call_command("recount", stdout=StringIO())
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(len(response.context["comments"]), 50)
+        self.assertContains(response, "Comments (55)")
+        self.assertContains(response, "?comments=2#comments")
+
+        response = self.client.get(self.post.get_absolute_url(), {"comments": 2})
+        self.assertEqual([c.content for c in response.context["comments"]][0], "Comment 50")
+        self.assertEqual(
+            self.client.get(self.post.get_absolute_url(), {"comments": 3}).status_code, 404
+        )
+        self.assertEqual(
+            self.client.get(self.post.get_absolute_url(), {"comments": "x"}).status_code, 404
+        )
+
+
 class BlogViewsTests(TestCase):
     def setUp(self) -> None:
+        cache.clear()
         self.author = User.objects.create_user(
             username="author",
             password="testpass123",
@@ -121,3 +264,1466 @@ class BlogViewsTests(TestCase):
         response = self.client.post(url, {"content": "Great post!"})
         self.assertEqual(response.status_code, 302)
         self.assertEqual(self.post.comments.count(), 1)
+
+
+class DashboardTests(TestCase):
+    def setUp(self) -> None:
+        self.staff = User.objects.create_user(username="editor", password="testpass123", is_staff=True)
+        self.writer = User.objects.create_user(username="writer", password="testpass123")
+        self.category = Category.objects.create(name="Travel")
+        now = timezone.now()
+        for n in range(30):
+            Post.objects.create(
+                title=f"Post {n:02d}",
+                author=self.writer if n % 3 == 0 else self.staff,
+                category=self.category if n % 2 == 0 else None,
+                content="<p>Body</p>",
+                status="draft" if n % 5 == 0 else "published",
+                publish_date=now + timedelta(days=1) if n == 1 else now - timedelta(days=n),
+            )
+        self.url = reverse("blog:dashboard")
+
+    def test_paginates_and_counts_statuses(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context["posts"]), 25)
+        self.assertEqual(response.context["paginator"].count, 30)
+        tabs = {value: count for value, _, count in response.context["status_tabs"]}
+        self.assertEqual(tabs, {"": 30, "published": 23, "scheduled": 1, "draft": 6})
+        self.assertEqual(
+            response.context["posts"][0].get_deferred_fields() & {"content", "body_text"},
+            {"content", "body_text"},
+        )
+
+        response = self.client.get(self.url, {"status": "draft", "sort": "title"})
+        self.assertEqual(
+            [post.title for post in response.context["posts"]],
+            ["Post 00", "Post 05", "Post 10", "Post 15", "Post 20", "Post 25"],
+        )
+
+    def test_filters_by_author_category_and_dates(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            self.url,
+            {
+                "author": self.writer.pk,
+                "category": self.category.pk,
+                "date_from": (timezone.localdate() - timedelta(days=12)).isoformat(),
+            },
+        )
+        self.assertEqual(
+            sorted(post.title for post in response.context["posts"]),
+            ["Post 00", "Post 06", "Post 12"],
+        )
+
+    def test_authors_only_see_their_posts(self):
+        self.client.force_login(self.writer)
+        response = self.client.get(self.url, {"author": self.staff.pk})
+        self.assertNotIn("author", response.context["filter_form"].fields)
+        self.assertEqual(response.context["paginator"].count, 10)
+
+
+class PostSearchTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.category = Category.objects.create(name="Tech")
+        self.tag = Tag.objects.create(name="Python")
+        self.title_match = Post.objects.create(
+            title="Django deployment guide",
+            author=self.user,
+            category=self.category,
+            content="<p>Shipping web apps.</p>",
+            status="published",
+            publish_date=timezone.now(),
+        )
+        self.body_match = Post.objects.create(
+            title="Weekly notes",
+            author=self.user,
+            category=self.category,
+            content="<p>We upgraded <strong>Django</strong> this week.</p>",
+            status="published",
+            publish_date=timezone.now(),
+        )
+
+    def search(self, query):
+        response = self.client.get(reverse("blog:post_list"), {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context["posts"])
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.search("django"), [self.title_match, self.body_match])
+
+    def test_prefix_and_markup_free_matching(self):
+        self.assertEqual(self.search("upgrad"), [self.body_match])
+        self.assertEqual(self.search("strong"), [])
+
+    def test_index_follows_tag_changes(self):
+        self.assertEqual(self.search("python"), [])
+        self.body_match.tags.add(self.tag)
+        self.assertEqual(self.search("python"), [self.body_match])
+        self.tag.posts.clear()
+        self.assertEqual(self.search("python"), [])
+
+    def test_index_follows_category_rename_and_post_delete(self):
+        self.category.name = "Engineering"
+        self.category.save()
+        self.assertEqual(len(self.search("engineering")), 2)
+        self.title_match.delete()
+        self.assertEqual(self.search("engineering"), [self.body_match])
+
+    def test_rebuild_command(self):
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search("weekly"), [self.body_match])
+
+
+class PublishedPostCounterTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.tech = Category.objects.create(name="Tech")
+        self.travel = Category.objects.create(name="Travel")
+        self.tag = Tag.objects.create(name="Python")
+        self.post = Post.objects.create(
+            title="Counted Post",
+            author=self.user,
+            category=self.tech,
+            content="Test content",
+            status="published",
+            publish_date=timezone.now(),
+        )
+        self.post.tags.add(self.tag)
+
+    def assertCounts(self, tech, travel, tag):
+        self.tech.refresh_from_db()
+        self.travel.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.assertEqual(
+            (self.tech.published_post_count, self.travel.published_post_count, self.tag.published_post_count),
+            (tech, travel, tag),
+        )
+
+    def test_counts_follow_publish_state_and_category(self):
+        self.assertCounts(1, 0, 1)
+        self.post.category = self.travel
+        self.post.save()
+        self.assertCounts(0, 1, 1)
+        self.post.status = "draft"
+        self.post.save()
+        self.assertCounts(0, 0, 0)
+
+    def test_drafts_and_scheduled_posts_are_not_counted(self):
+        Post.objects.create(
+            title="Draft", author=self.user, category=self.tech, content="x", status="draft"
+        )
+        Post.objects.create(
+            title="Scheduled",
+            author=self.user,
+            category=self.tech,
+            content="x",
+            status="published",
+            publish_date=timezone.now() + timedelta(days=1),
+        )
+        self.assertCounts(1, 0, 1)
+
+    def test_counts_follow_tag_changes_and_delete(self):
+        self.post.tags.clear()
+        self.assertCounts(1, 0, 0)
+        self.tag.posts.add(self.post)
+        self.assertCounts(1, 0, 1)
+        self.post.delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_recount_repairs_drift(self):
+        Category.objects.update(published_post_count=42)
+        call_command("recount", stdout=StringIO())
+        self.assertCounts(1, 0, 1)
+
+    def test_sidebar_renders_counts_without_per_category_queries(self):
+        url = reverse("blog:post_list")
+        self.client.get(url)
+        Category.objects.create(name="Food")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        queries_with_three = len(ctx)
+        Category.objects.create(name="Music")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(len(ctx), queries_with_three)
+        self.assertContains(response, '<span class="badge bg-secondary rounded-pill">1</span>', html=True)
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class SidebarCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.category = Category.objects.create(name="Tech")
+        Tag.objects.create(name="Python")
+
+    def test_sidebar_is_served_from_cache(self):
+        url = reverse("blog:post_list")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        sql = " ".join(query["sql"] for query in ctx.captured_queries)
+        self.assertNotIn('FROM "blog_category"', sql)
+        self.assertNotIn('FROM "blog_tag"', sql)
+        self.assertContains(response, "#Python")
+
+    def test_writes_invalidate_sidebar(self):
+        url = reverse("blog:post_list")
+        self.client.get(url)
+        self.category.name = "Engineering"
+        self.category.save()
+        self.assertContains(self.client.get(url), "Engineering")
+        Post.objects.create(
+            title="Fresh",
+            author=self.user,
+            category=self.category,
+            content="x",
+            status="published",
+            publish_date=timezone.now(),
+        )
+        self.assertContains(
+            self.client.get(url), '<span class="badge bg-secondary rounded-pill">1</span>', html=True
+        )
+
+
+class PageCacheTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.category = Category.objects.create(name="Tech")
+        self.other_category = Category.objects.create(name="Travel")
+        self.tag = Tag.objects.create(name="Python")
+        self.post = Post.objects.create(
+            title="Cached Post",
+            author=self.user,
+            category=self.category,
+            content="Original body",
+            status="published",
+            publish_date=timezone.now(),
+        )
+        self.post.tags.add(self.tag)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertCached(self, url):
+        self.assertEqual(self.get(url).headers.get("X-Page-Cache"), "hit")
+
+    def assertNotCached(self, url):
+        self.assertNotEqual(self.get(url).headers.get("X-Page-Cache"), "hit")
+
+    def test_anonymous_pages_are_cached(self):
+        url = self.post.get_absolute_url()
+        self.assertEqual(self.get(url).headers["X-Page-Cache"], "miss")
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertContains(self.get(url), "Original body")
+        self.assertEqual(len(ctx), 0)
+
+    def test_unread_query_parameters_share_the_entry(self):
+        url = reverse("blog:post_list")
+        self.get(f"{url}?q=cached")
+        self.assertCached(f"{url}?utm_source=feed&q=cached")
+        self.assertNotCached(f"{url}?q=other")
+        self.assertNotCached(f"{url}?comments=2&q=cached")
+
+    def test_logged_in_users_bypass_cache(self):
+        url = self.post.get_absolute_url()
+        self.get(url)
+        self.client.login(username="author", password="testpass123")
+        self.assertNotIn("X-Page-Cache", self.get(url).headers)
+
+    def test_post_save_purges_only_affected_pages(self):
+        detail = self.post.get_absolute_url()
+        home = reverse("blog:post_list")
+        tech = reverse("blog:category_posts", args=[self.category.slug])
+        travel = reverse("blog:category_posts", args=[self.other_category.slug])
+        tag = reverse("blog:tag_posts", args=[self.tag.slug])
+        for url in (detail, home, tech, travel, tag):
+            self.get(url)
+        self.post.content = "Edited body"
+        self.post.save()
+        for url in (detail, home, tech, tag):
+            self.assertNotCached(url)
+        self.assertCached(travel)
+        self.assertContains(self.get(detail), "Edited body")
+
+    def test_comment_purges_post_detail(self):
+        url = self.post.get_absolute_url()
+        self.get(url)
+        Comment.objects.create(post=self.post, author=self.user, content="First!")
+        self.assertContains(self.get(url), "First!")
+
+    def test_scheduled_post_going_live_purges_list(self):
+        scheduled = Post.objects.create(
+            title="Scheduled",
+            author=self.user,
+            category=self.category,
+            content="x",
+            status="published",
+            publish_date=timezone.now() + timedelta(seconds=30),
+        )
+        url = reverse("blog:post_list")
+        self.get(url)
+        self.assertCached(url)
+        Post.objects.filter(pk=scheduled.pk).update(publish_date=timezone.now())
+        publish_due_posts()
+        self.assertContains(self.get(url), "Scheduled")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.category = Category.objects.create(name="Tech")
+        self.post = Post.objects.create(
+            title="Validated Post",
+            author=self.user,
+            category=self.category,
+            content="Original body",
+            status="published",
+            publish_date=timezone.now() - timedelta(hours=1),
+        )
+        self.urls = [
+            reverse("blog:post_list"),
+            reverse("blog:category_posts", kwargs={"slug": self.category.slug}),
+            self.post.get_absolute_url(),
+        ]
+
+    def revalidate(self, url, response, **extra):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"], **extra)
+
+    def test_unchanged_pages_answer_304(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("no-cache", response["Cache-Control"])
+            self.assertTrue(response.has_header("Last-Modified"))
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304
+            )
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_304_skips_the_page_queries(self):
+        url = self.urls[0]
+        response = self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.assertEqual(len(ctx), 1)
+
+    def test_cached_page_answers_304_without_queries(self):
+        url = self.urls[2]
+        response = self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.assertEqual(len(ctx), 0)
+
+    def test_edits_comments_and_deletes_change_validators(self):
+        responses = {url: self.client.get(url) for url in self.urls}
+        Comment.objects.create(post=self.post, author=self.user, content="Nice")
+        for url, response in responses.items():
+            self.assertEqual(self.revalidate(url, response).status_code, 200, url)
+
+        responses = {url: self.client.get(url) for url in self.urls[:2]}
+        other = Post.objects.create(
+            title="Other", author=self.user, category=self.category, content="x", status="published"
+        )
+        other.delete()
+        for url, response in responses.items():
+            self.assertEqual(self.revalidate(url, response).status_code, 200, url)
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+    def test_related_posts_change_detail_validators(self):
+        url = self.urls[2]
+        other = Post.objects.create(
+            title="Elsewhere", author=self.user, content="x", status="published"
+        )
+        response = self.client.get(url)
+        RelatedPost.objects.create(post=self.post, related=other, score=1, rank=0)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        response = self.client.get(url)
+        pagecache.purge(f"post:{other.pk}")
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_deploy_changes_validators_and_cached_pages(self):
+        url = self.urls[2]
+        response = self.client.get(url)
+        with override_settings(BLOG_BUILD_ID="next"):
+            response = self.revalidate(url, response)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["X-Page-Cache"], "miss")
+
+    def test_logged_in_and_draft_requests_are_not_conditional(self):
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get(self.urls[0]).has_header("ETag"))
+        self.client.logout()
+        Post.objects.filter(pk=self.post.pk).update(status="draft")
+        self.assertEqual(self.client.get(self.urls[2], HTTP_IF_NONE_MATCH="*").status_code, 404)
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username="author", password="testpass123")
+        cls.category = Category.objects.create(name="Tech")
+        cls.tag = Tag.objects.create(name="Python")
+        cls.post = Post.objects.create(
+            title="Async Post",
+            author=cls.user,
+            category=cls.category,
+            content="<p>Awaited body</p>",
+            status="published",
+            publish_date=timezone.now() - timedelta(hours=1),
+        )
+        cls.post.tags.add(cls.tag)
+        cls.draft = Post.objects.create(title="Async Draft", author=cls.user, content="x")
+        Comment.objects.create(post=cls.post, author=cls.user, content="Async comment")
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    async def get(self, view_class, path="/", user=None, headers=None, **kwargs):
+        request = AsyncRequestFactory().get(path, headers=headers)
+        request.user = user or AnonymousUser()
+        request.auser = mock.AsyncMock(return_value=request.user)
+        request.session = {}
+        response = await view_class.as_view()(request, **kwargs)
+        if hasattr(response, "render"):
+            await sync_to_async(response.render)()
+        return response
+
+    async def test_read_views_render_through_the_async_orm(self):
+        self.assertTrue(views.AsyncPostListView.view_is_async)
+        response = await self.get(views.AsyncPostListView)
+        self.assertContains(response, "Async Post")
+        self.assertNotContains(response, "Async Draft")
+        for view_class, slug in [
+            (views.AsyncCategoryPostListView, self.category.slug),
+            (views.AsyncTagPostListView, self.tag.slug),
+        ]:
+            self.assertContains(await self.get(view_class, slug=slug), "Async Post")
+        response = await self.get(views.AsyncPostDetailView, slug=self.post.slug)
+        self.assertContains(response, "Awaited body")
+        self.assertContains(response, "Async comment")
+
+    async def test_missing_and_draft_pages_are_404(self):
+        with self.assertRaises(Http404):
+            await self.get(views.AsyncCategoryPostListView, slug="missing")
+        with self.assertRaises(Http404):
+            await self.get(views.AsyncPostDetailView, slug=self.draft.slug)
+        response = await self.get(views.AsyncPostDetailView, user=self.user, slug=self.draft.slug)
+        self.assertContains(response, "Async Draft")
+
+    async def test_conditional_get(self):
+        response = await self.get(views.AsyncPostListView)
+        headers = {"If-None-Match": response["ETag"]}
+        response = await self.get(views.AsyncPostListView, headers=headers)
+        self.assertEqual(response.status_code, 304)
+
+
+class SlowViewHandler(BaseHandler):
+    """The configured middleware around a view that awaits for 200ms."""
+
+    async def _get_response_async(self, request):
+        await asyncio.sleep(0.2)
+        return HttpResponse("done")
+
+
+class AsyncMiddlewareTests(TestCase):
+    def test_middleware_is_async_capable(self):
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), "async_capable", False), path)
+
+    async def test_concurrent_requests_overlap(self):
+        handler = SlowViewHandler()
+        handler.load_middleware(is_async=True)
+
+        # No ThreadSensitiveContext per request (as with AsyncClient): a sync-only
+        # middleware would then run all of them through the same thread.
+        started = time.perf_counter()
+        responses = await asyncio.gather(
+            *(handler.get_response_async(AsyncRequestFactory().get("/")) for _ in range(8))
+        )
+        elapsed = time.perf_counter() - started
+        self.assertEqual({response.status_code for response in responses}, {200})
+        # One after the other they would take 1.6s.
+        self.assertLess(elapsed, 0.8)
+
+    async def test_static_files_are_served_asynchronously(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        Path(static_root, "site.css").write_text("body{margin:0}")
+        with override_settings(STATIC_ROOT=static_root):
+            handler = SlowViewHandler()
+            handler.load_middleware(is_async=True)
+            response = await handler.get_response_async(
+                AsyncRequestFactory().get("/static/site.css")
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"body{margin:0}")
+        self.assertEqual(response["Content-Type"], "text/css; charset=\"utf-8\"")
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_TASKS_EAGER=False)
+class ScheduledPublishingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.category = Category.objects.create(name="Tech")
+        self.tag = Tag.objects.create(name="Python")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(
+                title="Coming Soon",
+                author=self.user,
+                category=self.category,
+                content="x",
+                status="published",
+                publish_date=timezone.now() + timedelta(hours=1),
+            )
+            self.post.tags.add(self.tag)
+
+    def make_due(self) -> None:
+        Post.objects.filter(pk=self.post.pk).update(publish_date=timezone.now() - timedelta(seconds=1))
+        Task.objects.update(run_at=timezone.now())
+
+    def test_future_post_is_held_as_scheduled(self):
+        self.assertEqual(self.post.status, "scheduled")
+        self.assertFalse(self.post.is_published)
+        self.assertNotContains(self.client.get(reverse("blog:post_list")), "Coming Soon")
+        self.assertEqual(self.client.get(self.post.get_absolute_url()).status_code, 404)
+        task_row = Task.objects.get(name="blog.publish_scheduled_posts")
+        self.assertEqual(task_row.run_at, self.post.publish_date)
+
+    def test_queued_task_publishes_due_post_like_a_manual_publish(self):
+        self.assertEqual(publish_due_posts(), 0)
+        self.make_due()
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.run_pending()
+        self.assertEqual(Task.objects.get(name="blog.publish_scheduled_posts").status, "done")
+        self.post.refresh_from_db()
+        self.category.refresh_from_db()
+        self.tag.refresh_from_db()
+        self.assertEqual(self.post.status, "published")
+        self.assertEqual((self.category.published_post_count, self.tag.published_post_count), (1, 1))
+        self.assertContains(self.client.get(reverse("blog:post_list"), {"q": "coming"}), "Coming Soon")
+        self.assertEqual(publish_due_posts(), 0)
+
+    def test_command_and_backdating(self):
+        self.make_due()
+        out = StringIO()
+        call_command("publish_scheduled", stdout=out)
+        self.assertIn("Published 1 scheduled posts.", out.getvalue())
+
+        draft = Post.objects.create(title="Draft", author=self.user, content="x")
+        draft.status = "scheduled"
+        draft.save()
+        self.assertEqual(draft.status, "published")
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class CursorPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        now = timezone.now()
+        # Pairs of posts share a publish_date so the id tie-breaker matters.
+        self.posts = [
+            Post.objects.create(
+                title=f"Post {i}",
+                author=self.user,
+                content="Body",
+                status="published",
+                publish_date=now - timedelta(minutes=i // 2),
+            )
+            for i in range(23)
+        ]
+        self.expected = sorted(self.posts, key=lambda p: (p.publish_date, p.pk), reverse=True)
+
+    def get_page(self, **params):
+        response = self.client.get(reverse("blog:post_list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["page_obj"]
+
+    def test_walks_forward_and_back_without_count(self):
+        seen = []
+        page = self.get_page()
+        pages = [page]
+        while page.has_next():
+            with CaptureQueriesContext(connection) as ctx:
+                page = self.get_page(cursor=page.next_cursor)
+            self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+            pages.append(page)
+        for page in pages:
+            seen += list(page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(p) for p in pages], [10, 10, 3])
+
+        back = self.get_page(cursor=pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        first = self.get_page(cursor=back.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse("blog:post_list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_results_paginate_by_rank(self):
+        page = self.get_page(q="post")
+        second = self.get_page(q="post", cursor=page.next_cursor)
+        self.assertEqual(len(page) + len(second), 20)
+        self.assertFalse(set(page) & set(second))
+
+
+class PostTextFieldsTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.post = Post.objects.create(
+            title="Long Read",
+            author=self.user,
+            content="<p>" + "word &amp; " * 450 + "</p>",
+            status="published",
+            publish_date=timezone.now(),
+        )
+
+    def test_text_fields_are_derived_on_save(self):
+        self.assertTrue(self.post.body_text.startswith("word & word"))
+        self.assertEqual(len(self.post.excerpt), 120)
+        self.assertEqual(self.post.word_count, 900)
+        self.assertEqual(self.post.reading_time, 5)
+
+        self.post.content = "<p>Short</p>"
+        self.post.save(update_fields=["content"])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.excerpt, self.post.word_count), ("Short", 1))
+
+    def test_list_view_defers_content(self):
+        response = self.client.get(reverse("blog:post_list"))
+        post = response.context["posts"][0]
+        self.assertEqual(
+            post.get_deferred_fields(), {"content", "content_html", "toc", "body_text"}
+        )
+        self.assertContains(response, escape(self.post.excerpt))
+
+    def test_backfill_command(self):
+        Post.objects.update(excerpt="", body_text="", word_count=0)
+        call_command("backfill_post_text", "--missing", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.word_count, 900)
+
+
+class RichTextTests(TestCase):
+    def test_unsafe_markup_is_removed(self):
+        html, _ = render_content(
+            '<p onclick="steal()">Hi<script>alert(1)</script> <b>there</p>'
+            '<iframe src="https://evil.example"></iframe><!-- note -->'
+            '<a href=" java\nscript:alert(1)">bad</a>'
+            '<a href="https://example.com" target="_blank">ok</a>'
+            '<span style="color: red; background: url(x.png)">styled</span>'
+        )
+        self.assertEqual(
+            html,
+            "<p>Hi <b>there</b></p><a>bad</a>"
+            '<a href="https://example.com" target="_blank" rel="noopener noreferrer">ok</a>'
+            '<span style="color: red">styled</span>',
+        )
+
+    def test_headings_get_anchors_and_toc(self):
+        html, toc = render_content(
+            "<h2>Setup &amp; install</h2><h3><em>First</em> step</h3><h2>Setup &amp; install</h2>"
+        )
+        self.assertIn(
+            '<h2 id="h-setup-install">Setup &amp; install'
+            '<a class="heading-anchor" href="#h-setup-install"',
+            html,
+        )
+        self.assertEqual(
+            toc,
+            [
+                {"level": 2, "id": "h-setup-install", "title": "Setup & install"},
+                {"level": 3, "id": "h-first-step", "title": "First step"},
+                {"level": 2, "id": "h-setup-install-2", "title": "Setup & install"},
+            ],
+        )
+
+    def test_named_anchors_are_prefixed_and_links_follow(self):
+        html, _ = render_content(
+            '<p><a href="#intro">Up</a> <a href="#setup">Setup</a> <a href="#comments">Say</a></p>'
+            '<p><a id="intro" name="intro"></a>Hi<a name="x onclick=y"></a></p><h2>Setup</h2>'
+        )
+        self.assertEqual(
+            html,
+            '<p><a href="#a-intro">Up</a> <a href="#h-setup">Setup</a> <a href="#comments">Say</a></p>'
+            '<p><a id="a-intro" name="a-intro"></a>Hi<a></a></p>'
+            '<h2 id="h-setup">Setup<a class="heading-anchor" href="#h-setup"'
+            ' aria-label="Link to this section">#</a></h2>',
+        )
+
+    def test_images_are_lazy(self):
+        html, _ = render_content('<img src="/media/uploads/a.png" onerror="x()">')
+        self.assertEqual(
+            html, '<img src="/media/uploads/a.png" alt="" loading="lazy" decoding="async">'
+        )
+
+    def test_post_page_serves_rendered_content(self):
+        user = User.objects.create_user(username="author", password="testpass123")
+        post = Post.objects.create(
+            title="Guide",
+            author=user,
+            content="<h2>One</h2><p>A</p><h2>Two</h2><script>alert(1)</script>",
+            status="published",
+            publish_date=timezone.now(),
+        )
+        self.assertEqual([heading["id"] for heading in post.toc], ["h-one", "h-two"])
+        response = self.client.get(post.get_absolute_url())
+        self.assertContains(response, '<a href="#h-two">Two</a>', html=True)
+        self.assertNotContains(response, "alert(1)")
+        self.assertEqual(
+            response.context["post"].get_deferred_fields(), {"content", "body_text"}
+        )
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class RelatedPostsTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.python = Tag.objects.create(name="Python")
+        self.travel = Tag.objects.create(name="Travel")
+
+        def make(title, content, *tags):
+            post = Post.objects.create(
+                title=title,
+                author=self.user,
+                content=content,
+                status="published",
+                publish_date=timezone.now(),
+            )
+            post.tags.set(tags)
+            return post
+
+        self.django = make("Django views", "<p>Class based views and querysets.</p>", self.python)
+        self.orm = make("Django ORM tips", "<p>Querysets, prefetching and views.</p>", self.python)
+        self.kyoto = make("Kyoto in spring", "<p>Temples and cherry blossoms.</p>", self.travel)
+        self.paris = make("Paris on foot", "<p>Museums, cafes and temples.</p>", self.travel)
+
+    def related_titles(self, post):
+        response = self.client.get(post.get_absolute_url())
+        return [related.title for related in response.context["related_posts"]]
+
+    def test_rebuild_scores_by_tags_and_text(self):
+        call_command("build_related_posts", stdout=StringIO())
+        self.assertEqual(self.related_titles(self.django), ["Django ORM tips"])
+        self.assertEqual(self.related_titles(self.kyoto), ["Paris on foot"])
+
+    def test_refresh_merges_new_post_into_peers(self):
+        call_command("build_related_posts", stdout=StringIO())
+        rome = Post.objects.create(
+            title="Rome temples",
+            author=self.user,
+            content="<p>Temples, museums and cafes.</p>",
+            status="published",
+            publish_date=timezone.now(),
+        )
+        rome.tags.add(self.travel)
+        call_command("build_related_posts", "--post", rome.slug, stdout=StringIO())
+        self.assertIn("Rome temples", self.related_titles(self.paris))
+        self.assertEqual(self.related_titles(rome)[0], "Paris on foot")
+
+    def test_unpublished_neighbours_are_hidden(self):
+        call_command("build_related_posts", stdout=StringIO())
+        self.orm.status = "draft"
+        self.orm.save()
+        self.assertNotIn("Django ORM tips", self.related_titles(self.django))
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=600)
+    def test_cached_page_drops_unpublished_neighbour(self):
+        cache.clear()
+        call_command("build_related_posts", stdout=StringIO())
+        url = self.django.get_absolute_url()
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "hit")
+        self.orm.status = "draft"
+        self.orm.save()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Page-Cache"], "miss")
+        self.assertNotContains(response, self.orm.get_absolute_url())
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=600)
+    def test_rebuild_purges_pages_whose_list_changed(self):
+        cache.clear()
+        call_command("build_related_posts", stdout=StringIO())
+        kyoto, django = self.kyoto.get_absolute_url(), self.django.get_absolute_url()
+        self.client.get(kyoto)
+        self.client.get(django)
+        RelatedPost.objects.filter(post=self.kyoto).delete()
+        call_command("build_related_posts", stdout=StringIO())
+        self.assertEqual(self.client.get(kyoto)["X-Page-Cache"], "miss")
+        self.assertEqual(self.client.get(django)["X-Page-Cache"], "hit")
+
+    def test_refresh_loads_only_the_neighbourhood(self):
+        call_command("build_related_posts", stdout=StringIO())
+        corpus = related.load_neighbourhood({self.django.pk}, cache.get(related.FREQUENCIES_KEY))
+        self.assertEqual(set(corpus.vectors), {self.django.pk, self.orm.pk})
+
+    def test_refresh_drops_links_to_a_post_that_is_no_longer_similar(self):
+        call_command("build_related_posts", stdout=StringIO())
+        self.assertTrue(RelatedPost.objects.filter(post=self.django, related=self.orm).exists())
+        self.orm.title = "Gardening notes"
+        self.orm.content = "<p>Tomatoes and compost.</p>"
+        self.orm.save()
+        self.orm.tags.clear()
+        related.refresh_related_posts([self.orm.pk])
+        self.assertFalse(RelatedPost.objects.filter(related=self.orm).exists())
+        self.assertFalse(RelatedPost.objects.filter(post=self.orm).exists())
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_TASKS_EAGER=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username="author", password="testpass123")
+
+    def make_png(self, name, size=(800, 400)):
+        buffer = BytesIO()
+        Image.new("RGBA", size, (200, 30, 30, 128)).save(buffer, format="PNG")
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_derivatives_are_generated_and_rendered(self):
+        inline = self.make_png("uploads/inline.png", size=(500, 300))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            post = Post.objects.create(
+                title="Pictures",
+                author=self.user,
+                featured_image=SimpleUploadedFile("hero.png", default_storage.open(inline).read()),
+                content=f'<p><img alt="x" src="{default_storage.url(inline)}"></p>',
+                status="published",
+                publish_date=timezone.now(),
+            )
+        self.assertEqual(len(callbacks), 2)
+        self.assertTrue(Task.objects.filter(name="blog.process_post_images", args=[post.pk]).exists())
+
+        manifest = process_post_images(post.pk)
+        self.assertEqual(set(manifest), {post.featured_image.name, inline})
+        widths = [width for width, _ in manifest[inline]["variants"]["jpeg"]]
+        self.assertEqual(widths, [320, 500])
+        for _, name in manifest[inline]["variants"]["webp"]:
+            self.assertTrue(default_storage.exists(name))
+
+        post.refresh_from_db()
+        self.assertIn("<picture>", post.content_html)
+        response = self.client.get(post.get_absolute_url())
+        self.assertContains(response, "<picture>", count=2)
+        self.assertContains(response, 'loading="lazy" decoding="async"')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'width="500" height="300"')
+
+    def test_saving_only_queues_the_work(self):
+        inline = self.make_png("uploads/inline.png", size=(500, 300))
+        with mock.patch.object(images, "generate_derivatives") as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                post = Post.objects.create(
+                    title="Pictures",
+                    author=self.user,
+                    content=f'<p><img alt="x" src="{default_storage.url(inline)}"></p>',
+                    status="published",
+                    publish_date=timezone.now(),
+                )
+        generate.assert_not_called()
+        task_row = Task.objects.get(name="blog.process_post_images")
+        self.assertEqual((task_row.queue, task_row.status, task_row.args), ("media", "queued", [post.pk]))
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, {})
+        self.assertEqual(default_storage.listdir("uploads")[1], ["inline.png"])
+
+    def test_edit_during_generation_is_kept(self):
+        inline = self.make_png("uploads/inline.png", size=(500, 300))
+        post = Post.objects.create(
+            title="Pictures",
+            author=self.user,
+            content=f'<p><img alt="x" src="{default_storage.url(inline)}"></p>',
+        )
+        generate = images.generate_derivatives
+
+        def edit_meanwhile(name):
+            Post.objects.filter(pk=post.pk).update(
+                content=f'<p>Edited</p><p><img alt="x" src="{default_storage.url(inline)}"></p>'
+            )
+            return generate(name)
+
+        with mock.patch.object(images, "generate_derivatives", edit_meanwhile):
+            process_post_images(post.pk)
+        post.refresh_from_db()
+        self.assertIn("<p>Edited</p>", post.content_html)
+        self.assertIn("<picture>", post.content_html)
+
+    def test_posts_without_images_are_not_scheduled(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Post.objects.create(title="Plain", author=self.user, content="<p>Text</p>")
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Task.objects.exists())
+
+
+_calls = []
+
+
+@queue.task(name="blog.test_record")
+def record_call(value):
+    _calls.append(value)
+
+
+@queue.task(name="blog.test_fail", max_attempts=2)
+def always_fail():
+    raise RuntimeError("boom")
+
+
+@queue.task(name="blog.test_media", queue="media")
+def record_media_call(value):
+    _calls.append(value)
+
+
+@override_settings(BLOG_TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self) -> None:
+        _calls.clear()
+
+    def test_enqueued_task_waits_for_commit_and_runs_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.enqueue("blog.test_record", 1, dedupe=True)
+            queue.enqueue("blog.test_record", 1, dedupe=True)
+            self.assertFalse(Task.objects.exists())
+        self.assertEqual(Task.objects.count(), 1)
+
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(_calls, [1])
+        self.assertEqual(Task.objects.get().status, "done")
+
+    def test_failing_task_is_retried_with_backoff_then_failed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.enqueue("blog.test_fail")
+        self.assertEqual(queue.run_pending(), 1)
+        task_row = Task.objects.get()
+        self.assertEqual(task_row.status, "queued")
+        self.assertGreater(task_row.run_at, timezone.now())
+        self.assertIn("RuntimeError", task_row.last_error)
+
+        Task.objects.update(run_at=timezone.now())
+        queue.run_pending()
+        task_row.refresh_from_db()
+        self.assertEqual((task_row.status, task_row.attempts), ("failed", 2))
+
+    def test_workers_only_claim_their_queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.enqueue("blog.test_media", 4)
+        self.assertEqual(Task.objects.get().queue, "media")
+        self.assertEqual(queue.run_pending(), 0)
+        self.assertEqual(queue.run_pending(queue="media"), 1)
+        self.assertEqual(_calls, [4])
+
+    def test_stale_running_tasks_are_requeued(self):
+        Task.objects.create(
+            name="blog.test_record", args=[2], status="running",
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(queue.requeue_stale(), 1)
+        queue.run_pending()
+        self.assertEqual(_calls, [2])
+
+    @override_settings(BLOG_TASKS_EAGER=True)
+    def test_eager_mode_runs_after_commit_without_a_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.enqueue("blog.test_record", 3)
+        self.assertEqual(_calls, [3])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_TASKS_EAGER=False)
+class TransferTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="author", password="testpass123")
+        self.reader = User.objects.create_user(username="reader", password="testpass123")
+        self.category = Category.objects.create(name="Travel")
+        self.tag = Tag.objects.create(name="Holiday")
+        self.post = Post.objects.create(
+            title="Kyoto in spring",
+            author=self.user,
+            category=self.category,
+            content="<p>Temples and cherry blossoms.</p>",
+            status="published",
+            publish_date=timezone.now() - timedelta(days=1),
+        )
+        self.post.tags.add(self.tag)
+        self.comment = Comment.objects.create(post=self.post, author=self.reader, content="Lovely")
+
+    def round_trip(self):
+        buffer = StringIO()
+        write_records(export_records(), buffer)
+        buffer.seek(0)
+        return list(read_records(buffer))
+
+    def test_export_then_import_restores_posts(self):
+        commented_at = timezone.now().replace(microsecond=0) - timedelta(days=3)
+        Comment.objects.update(created_at=commented_at)
+        records = self.round_trip()
+        Post.objects.all().delete()
+        Category.objects.all().delete()
+        Tag.objects.all().delete()
+
+        importer = import_records(records)
+        self.assertEqual(importer.created["post"], 1)
+        self.assertEqual(importer.skipped["user"], 2)
+        post = Post.objects.get(slug="kyoto-in-spring")
+        self.assertEqual(post.excerpt, "Temples and cherry blossoms.")
+        self.assertEqual(list(post.tags.values_list("slug", flat=True)), ["holiday"])
+        self.assertEqual(post.comments.get().created_at, commented_at)
+        self.assertEqual(Category.objects.get().published_post_count, 1)
+        response = self.client.get(reverse("blog:post_list"), {"q": "blossoms"})
+        self.assertContains(response, "Kyoto in spring")
+
+    def test_reimport_skips_existing_rows(self):
+        importer = import_records(self.round_trip())
+        self.assertEqual(sum(importer.created.values()), 0)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_import_generates_slugs_in_bounded_queries(self):
+        records = [
+            {"type": "tag", "name": "Holiday"},
+            {"type": "category", "name": "Food"},
+        ] + [
+            {
+                "type": "post",
+                "title": "Kyoto in spring" if n % 2 else f"Post {n}",
+                "author": "author",
+                "category": "food",
+                "tags": ["holiday"],
+                "content": "<p>Text</p>",
+                "comments": [{"author": "reader", "content": "Nice"}],
+            }
+            for n in range(40)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            importer = import_records(records, batch_size=20)
+        self.assertEqual(importer.created["post"], 20)
+        self.assertEqual(importer.skipped["post"], 20)
+        self.assertEqual(importer.skipped["tag"], 1)
+        self.assertLess(len(queries), 120)
+        self.assertEqual(Post.objects.filter(category__slug="food").count(), 20)
+
+    def test_unknown_references_are_rejected(self):
+        with self.assertRaises(ArchiveError):
+            import_records([{"type": "post", "title": "Orphan", "author": "nobody", "content": "x"}])
+        self.assertFalse(Post.objects.filter(title="Orphan").exists())
+        with self.assertRaises(ArchiveError):
+            list(read_records(StringIO('{"type": "widget"}\n')))
+
+
+@override_settings(BLOG_TASKS_EAGER=False)
+class FakeDataBenchmarkTests(TestCase):
+    def test_generator_is_deterministic_and_resumable(self):
+        first = [record.get("slug") for record in generate_records(20, users=3, tags=10, seed=7)]
+        again = [record.get("slug") for record in generate_records(20, users=3, tags=10, seed=7)]
+        self.assertEqual(first, again)
+
+        import_records(generate_records(10, users=3, tags=10, seed=7))
+        importer = import_records(generate_records(20, users=3, tags=10, seed=7))
+        self.assertEqual((importer.created["post"], importer.skipped["post"]), (10, 10))
+        self.assertEqual(Post.objects.count(), 20)
+
+    def test_benchmark_reports_every_scenario(self):
+        import_records(generate_records(30, users=3, tags=10))
+        results = run_benchmark(iterations=2, sample=3)
+        self.assertEqual(
+            set(results["scenarios"]),
+            {"post_list", "post_list_deep", "post_detail", "search", "category", "tag", "dashboard"},
+        )
+        for result in results["scenarios"].values():
+            self.assertEqual(result["status"], [200])
+            self.assertGreater(result["queries"], 0)
+            self.assertGreater(result["render"], 0)
+        rows = compare(results, results)
+        self.assertTrue(rows)
+        self.assertTrue(all(change == 0 for *_, change in rows))
+
+
+class ConcurrentBenchmarkTests(TransactionTestCase):
+    # Committed data, so the benchmark's extra threads and connections see it.
+
+    def test_concurrent_wsgi_and_asgi_runs_report_throughput(self):
+        import_records(generate_records(15, users=2, tags=5))
+        for asgi in (False, True):
+            results = run_benchmark(
+                iterations=4, sample=2, only=["post_list", "post_detail"],
+                concurrency=2, asgi=asgi, db_latency=1,
+            )
+            self.assertEqual(results["meta"]["handler"], "asgi" if asgi else "wsgi")
+            for result in results["scenarios"].values():
+                self.assertEqual(result["status"], [200])
+                self.assertGreater(result["rps"], 0)
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class RequestTimingTests(TestCase):
+    def setUp(self) -> None:
+        timing.reset()
+        self.staff = User.objects.create_user(username="staff", password="pw", is_staff=True)
+        Post.objects.create(
+            title="Timed",
+            author=self.staff,
+            content="Body",
+            status="published",
+            publish_date=timezone.now(),
+        )
+
+    @override_settings(BLOG_SERVER_TIMING=True)
+    def test_server_timing_header_and_histograms(self):
+        response = self.client.get(reverse("blog:post_list"))
+        header = response["Server-Timing"]
+        self.assertRegex(header, r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.client.get(reverse("blog:post_list"))
+        stats = timing.summary()["views"]["blog:post_list"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertGreater(stats["template_ms"]["p50"], 0)
+        self.assertGreater(stats["queries"]["mean"], 0)
+        self.assertLessEqual(stats["total_ms"]["p50"], stats["total_ms"]["max"])
+
+    @override_settings(BLOG_SERVER_TIMING=True)
+    async def test_async_requests_count_their_queries(self):
+        response = await self.async_client.get(reverse("blog:post_list"))
+        self.assertEqual(response.status_code, 200)
+        queries = int(re.search(r'desc="(\d+) queries"', response["Server-Timing"])[1])
+        self.assertGreater(queries, 0)
+
+    @override_settings(BLOG_SERVER_TIMING=False)
+    def test_server_timing_is_for_staff_only_when_disabled(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("blog:post_list")))
+        self.client.force_login(self.staff)
+        self.assertIn("Server-Timing", self.client.get(reverse("blog:post_list")))
+
+    def test_timings_endpoint_is_staff_only(self):
+        url = reverse("blog:timings")
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        self.client.get(reverse("blog:post_list"))
+        data = self.client.get(url).json()
+        self.assertIn("blog:post_list", data["views"])
+        self.assertEqual(set(data["views"]["blog:post_list"]["total_ms"]), {"p50", "p95", "p99", "max", "mean"})
+
+    @override_settings(BLOG_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_as_json(self):
+        with self.assertLogs("blog.timing", "WARNING") as logs:
+            self.client.get(reverse("blog:post_list"))
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["view"], "blog:post_list")
+        self.assertEqual(entry["status"], 200)
+
+    def test_histogram_percentiles_are_within_a_bucket(self):
+        histogram = timing.Histogram()
+        for value in range(1, 1001):
+            histogram.record(value)
+        self.assertAlmostEqual(histogram.percentile(50), 500, delta=50)
+        self.assertAlmostEqual(histogram.percentile(99), 990, delta=99)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+
+class EagerSampler(profiling.Sampler):
+    """Also samples on entry, so a request finishing within one interval has a sample."""
+
+    def __enter__(self):
+        self.stacks[profiling.collapse(sys._current_frames()[self.thread_id])] += 1
+        return super().__enter__()
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class SamplingProfilerTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        sampler = mock.patch.object(profiling, "Sampler", EagerSampler)
+        sampler.start()
+        self.addCleanup(sampler.stop)
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        self.staff = User.objects.create_user(username="staff", password="pw", is_staff=True)
+        self.reader = User.objects.create_user(username="reader", password="pw")
+        self.post = Post.objects.create(
+            title="Profiled",
+            author=self.staff,
+            content="Body",
+            status="published",
+            publish_date=timezone.now(),
+        )
+
+    def profiles(self, name="blog.post_list"):
+        return sorted((Path(self.profile_dir) / name).glob("*.folded"))
+
+    def test_staff_can_profile_a_request(self):
+        self.client.force_login(self.staff)
+        with override_settings(BLOG_PROFILE_DIR=self.profile_dir, BLOG_PROFILE_INTERVAL_MS=0.1):
+            response = self.client.get(self.post.get_absolute_url(), {"_profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("samples", response["X-Profile"])
+        [path] = self.profiles("blog.post_detail")
+        stacks = profiling.read_profiles(path.parent)
+        self.assertTrue(any("SamplingProfilerMiddleware.__call__" in stack for stack in stacks))
+        self.assertTrue(all(stack.count(";") >= 1 for stack in stacks))
+
+    def test_other_users_cannot_turn_it_on(self):
+        self.client.force_login(self.reader)
+        with override_settings(BLOG_PROFILE_DIR=self.profile_dir):
+            response = self.client.get(reverse("blog:post_list"), headers={"X-Profile": "1"})
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(self.profiles(), [])
+
+    def test_sampled_traffic_is_profiled(self):
+        with override_settings(
+            BLOG_PROFILE_DIR=self.profile_dir,
+            BLOG_PROFILE_SAMPLE_RATE=1,
+            BLOG_PROFILE_INTERVAL_MS=0.1,
+        ):
+            response = self.client.get(reverse("blog:post_list"))
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_frames_are_named_by_module_and_qualname(self):
+        self.assertEqual(
+            profiling.collapse(sys._getframe()).rsplit(";", 1)[-1],
+            "blog.tests:SamplingProfilerTests.test_frames_are_named_by_module_and_qualname",
+        )
+        frame = mock.Mock(
+            f_code=profiling._TEMPLATE_RENDER_CODE,
+            f_globals={"__name__": "django.template.base"},
+            f_locals={"self": mock.Mock(spec=["name"], name="template")},
+        )
+        frame.f_locals["self"].name = "blog/post_list.html"
+        self.assertEqual(
+            profiling.frame_name(frame), "django.template.base:Template.render [blog/post_list.html]"
+        )
+
+    def test_report_merges_profiles(self):
+        folder = Path(self.profile_dir) / "blog.post_list"
+        profiling.write_profile(self.profile_dir, "blog:post_list", Counter({"a;b;c": 3, "a;b": 1}))
+        profiling.write_profile(self.profile_dir, "blog:post_list", Counter({"a;b;c": 2}))
+        self.assertEqual(profiling.read_profiles(folder), Counter({"a;b;c": 5, "a;b": 1}))
+        self.assertEqual(profiling.hottest_functions(profiling.read_profiles(folder))[0], ("c", 5, 5))
+        out = StringIO()
+        with override_settings(BLOG_PROFILE_DIR=self.profile_dir):
+            call_command("profile_report", "blog:post_list", stdout=out)
+        self.assertIn("6 samples from 2 profiles", out.getvalue())
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0)
+class TemplateRenderingTests(TestCase):
+    def setUp(self) -> None:
+        caches["templates"].clear()
+        self.user = User.objects.create_user(username="writer", password="pw")
+
+    def test_warm_up_compiles_every_project_template(self):
+        if not settings.BLOG_CACHED_TEMPLATES:
+            self.skipTest("needs the cached template loader")
+        loader = engines["django"].engine.template_loaders[0]
+        loader.reset()
+        compiled = warm_templates()
+        names = set(project_templates(engines["django"]))
+        self.assertEqual(compiled, len(names))
+        self.assertIn("blog/post_list.html", names)
+        self.assertLessEqual(names, set(loader.get_template_cache))
+
+    def test_base_fragments_are_cached_per_login_state(self):
+        self.client.get(reverse("blog:post_list"))
+        self.assertIsNotNone(caches["templates"].get(make_template_fragment_key("base_footer")))
+        self.assertIsNotNone(caches["templates"].get(make_template_fragment_key("base_nav", [False])))
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("blog:post_list"))
+        self.assertContains(response, reverse("blog:dashboard"))
+        self.assertContains(response, "Hi, writer")
+        self.client.logout()
+        response = self.client.get(reverse("blog:post_list"))
+        self.assertNotContains(response, reverse("blog:dashboard"))
+        self.assertContains(response, reverse("users:signup"))
+
+
+class StaticAssetTests(TestCase):
+    def test_minify_css(self):
+        css = """
+        /* Comment */
+        .post-content :is(h2, h3) a {
+          content: "a, b  /* kept */";
+          margin: 0 auto;
+        }
+        """
+        self.assertEqual(
+            staticassets.minify_css(css),
+            '.post-content :is(h2,h3) a{content:"a, b  /* kept */";margin:0 auto}',
+        )
+
+    def test_unused_ckeditor_files_are_not_collected(self):
+        finder = staticassets.PrunedAppDirectoriesFinder()
+        paths = {path for path, _ in finder.list(["CVS", ".*", "*~"])}
+        for kept in (
+            "ckeditor/ckeditor/ckeditor.js",
+            "ckeditor/ckeditor/lang/en.js",
+            "ckeditor/ckeditor/plugins/image/dialogs/image.js",
+            "ckeditor/ckeditor/skins/moono-lisa/editor.css",
+            "ckeditor/ckeditor-init.js",
+            "admin/css/base.css",
+        ):
+            self.assertIn(kept, paths)
+        for pruned in (
+            "ckeditor/ckeditor/lang/de.js",
+            "ckeditor/ckeditor/plugins/flash/dialogs/flash.js",
+            "ckeditor/ckeditor/plugins/a11yhelp/dialogs/lang/fr.js",
+            "ckeditor/ckeditor/CHANGES.md",
+        ):
+            self.assertNotIn(pruned, paths)
+        self.assertIsNotNone(finder.find("ckeditor/ckeditor/lang/de.js"))
+
+    def test_collected_files_are_fingerprinted_and_compressed(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with override_settings(
+            STATIC_ROOT=static_root,
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            STORAGES={
+                **settings.STORAGES,
+                "staticfiles": {"BACKEND": "blog.staticassets.StaticAssetStorage"},
+            },
+        ):
+            call_command("collectstatic", "--noinput", verbosity=0)
+            url = staticfiles_storage.url("css/styles.css")
+            response = Client().get(url, headers={"accept-encoding": "gzip"})
+        self.assertRegex(url, r"^/static/css/styles\.[0-9a-f]{12}\.css$")
+        self.assertEqual(response["Cache-Control"], "max-age=315360000, public, immutable")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        minified = (Path(static_root) / url.removeprefix("/static/")).read_text()
+        self.assertNotIn("/*", minified)
+        self.assertNotIn("\n", minified)
+
+
+class DatabaseConnectionTests(TestCase):
+    def test_health_reports_connection_stats(self):
+        dbconnections.reset_stats()
+        response = self.client.get(reverse("blog:health"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "max-age=0, no-cache, no-store, must-revalidate, private")
+        data = response.json()
+        self.assertEqual(data["status"], "ok")
+        database = data["databases"]["default"]
+        self.assertTrue(database["ok"])
+        self.assertEqual(database["requests"], 1)
+        self.assertFalse(database["pooled"])
+
+    def test_health_fails_when_the_database_does_not_answer(self):
+        with mock.patch.object(connection, "cursor", side_effect=OperationalError("gone")):
+            with self.assertLogs("blog.dbconnections", "ERROR"):
+                response = self.client.get(reverse("blog:health"))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "unavailable")
+        self.assertFalse(response.json()["databases"]["default"]["ok"])
+
+    def test_new_connections_are_counted(self):
+        dbconnections.reset_stats()
+        self.client.get(reverse("blog:health"))
+        self.client.get(reverse("blog:health"))
+        connection_created.send(sender=type(connection), connection=connection)
+        stats = dbconnections.connection_stats()["default"]
+        self.assertEqual(stats["opened"], 1)
+        self.assertEqual(stats["requests_per_connection"], 2)
+
+    def test_sqlite_is_tuned_for_concurrent_readers(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+@override_settings(BLOG_PAGE_CACHE_TIMEOUT=0, BLOG_TASKS_EAGER=False)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Per-view query budgets, measured with a cold sidebar cache."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.staff = User.objects.create_user(username="editor", password="testpass123", is_staff=True)
+        self.category = Category.objects.create(name="Travel")
+        self.tag = Tag.objects.create(name="Holiday")
+        self.posts = []
+        for n in range(12):
+            post = Post.objects.create(
+                title=f"Trip {n}",
+                author=self.staff,
+                category=self.category,
+                content="<p>Temples and cherry blossoms.</p>",
+                status="published",
+                publish_date=timezone.now() - timedelta(hours=n + 1),
+            )
+            post.tags.add(self.tag)
+            self.posts.append(post)
+        for n in range(4):
+            reader = User.objects.create_user(username=f"reader{n}", password="testpass123")
+            Comment.objects.create(post=self.posts[0], author=reader, content="Lovely")
+
+    # Anonymous page views include one conditional-GET validator query.
+    def test_list_views(self):
+        with self.assertQueryBudget(5):
+            self.client.get(reverse("blog:post_list"))
+        with self.assertQueryBudget(4):
+            self.client.get(reverse("blog:category_posts", kwargs={"slug": self.category.slug}))
+        with self.assertQueryBudget(4):
+            self.client.get(reverse("blog:tag_posts", kwargs={"slug": self.tag.slug}))
+        with self.assertQueryBudget(3):
+            self.client.get(reverse("blog:post_list"), {"q": "temples"})
+
+    def test_dashboard(self):
+        self.client.force_login(self.staff)
+        with self.assertQueryBudget(6):
+            self.client.get(reverse("blog:dashboard"))
+
+    def test_post_detail(self):
+        with self.assertQueryBudget(6):
+            self.client.get(self.posts[0].get_absolute_url())
+
+    def test_listings_use_their_indexes(self):
+        plans = {plan.name: plan for plan in check_plans()}
+        self.assertEqual(set(plans), {"post_list", "category", "tag"})
+        for plan in plans.values():
+            self.assertTrue(plan.uses_index, f"{plan.name} does not use {plan.indexes}:\n{plan.plan}")
+        out = StringIO()
+        call_command("explain_queries", stdout=out)
+        self.assertIn("category: post_category_published_idx ok", out.getvalue())
+
+    def test_repeated_shapes_are_detected(self):
+        with QueryLog() as log:
+            for post in Post.objects.all()[:4]:
+                post.author.username
+        self.assertEqual(list(log.repeated().values()), [4])
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+
+    @override_settings(BLOG_QUERY_LOG=True)
+    def test_middleware_warns_about_repeated_queries(self):
+        def view(request):
+            for post in Post.objects.all()[:4]:
+                post.author.username
+            return HttpResponse()
+
+        with self.assertLogs("blog.querylog", "WARNING") as logs:
+            QueryLogMiddleware(view)(RequestFactory().get("/"))
+        self.assertIn("repeated: 4x", logs.output[0])
@@ -0,0 +1,27 @@
+"""Plain-text helpers for post bodies stored as CKEditor HTML."""
+import html
+import math
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 120
+WORDS_PER_MINUTE = 200
+
+
+def html_to_text(value: str) -> str:
+    """Return the visible text of an HTML fragment with whitespace collapsed."""
+    return " ".join(html.unescape(strip_tags(value or "")).split())
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    return Truncator(text).chars(length)
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def reading_time(word_count: int) -> int:
+    """Estimated reading time in whole minutes (at least one)."""
+    return max(1, math.ceil(word_count / WORDS_PER_MINUTE))
@@ -0,0 +1,224 @@
+"""Per-request timing: ``Server-Timing`` headers, log lines and latency histograms.
+
+``RequestTimingMiddleware`` measures, for every request, the total time spent
+below it, the time and number of database queries (with ``blog.querylog``'s
+``QueryLog``) and the time spent rendering the template response. Rendering
+is timed between ``process_template_response`` and a post-render callback, so
+it includes any queries the template triggers; cached pages skip it.
+
+Each request is then
+
+* described in a ``Server-Timing`` header (``db``, ``tpl`` and ``total``),
+  visible in the browser's network panel. The header is sent to staff, and to
+  everyone when ``BLOG_SERVER_TIMING`` is on (default: ``DEBUG``);
+* logged to ``blog.timing`` as one JSON object: at INFO, or at WARNING when it
+  took longer than ``BLOG_SLOW_REQUEST_MS``;
+* added to in-process histograms keyed by URL name, which the staff-only
+  ``/dashboard/timings/`` endpoint reports as p50/p95/p99.
+
+Histograms use fixed buckets growing by 10%, so percentiles are accurate to
+about 10% and memory stays constant however many requests are recorded. They
+are per process: with several gunicorn workers each one keeps its own.
+
+The middleware is async-capable, so under ASGI it does not push requests
+through Django's single sync thread. ``QueryLog`` is entered and left in the
+thread that runs the request's queries: database connections are per thread.
+"""
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .querylog import QueryLog
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in milliseconds: 0.1ms to about 100s, 10% apart.
+BUCKET_BOUNDS = tuple(0.1 * 1.1**n for n in range(int(math.log(1e6, 1.1)) + 2))
+
+
+class Histogram:
+    """Counts of values in fixed, exponentially growing buckets."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound of the bucket holding the ``percent``-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                bound = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "p50": round(self.percentile(50), 2),
+            "p95": round(self.percentile(95), 2),
+            "p99": round(self.percentile(99), 2),
+            "max": round(self.max, 2),
+            "mean": round(self.sum / self.count, 2) if self.count else 0.0,
+        }
+
+
+class ViewTimings:
+    """Histograms of one URL name's total, database and template times."""
+
+    def __init__(self):
+        self.total = Histogram()
+        self.db = Histogram()
+        self.template = Histogram()
+        self.queries = Histogram()
+
+    def record(self, timing: dict) -> None:
+        self.total.record(timing["total"])
+        self.db.record(timing["db"])
+        self.template.record(timing["template"])
+        self.queries.record(timing["queries"])
+
+    def summary(self) -> dict:
+        return {
+            "requests": self.total.count,
+            "total_ms": self.total.summary(),
+            "db_ms": self.db.summary(),
+            "template_ms": self.template.summary(),
+            "queries": {
+                "mean": round(self.queries.sum / self.queries.count, 1),
+                "max": int(self.queries.max),
+            },
+        }
+
+
+_lock = threading.Lock()
+_timings = {}
+
+
+def record(name: str, timing: dict) -> None:
+    with _lock:
+        if name not in _timings:
+            _timings[name] = ViewTimings()
+        _timings[name].record(timing)
+
+
+def summary() -> dict:
+    """Latency percentiles per URL name for this process, slowest p95 first."""
+    with _lock:
+        views = {name: timings.summary() for name, timings in _timings.items()}
+    return {
+        "pid": os.getpid(),
+        "views": dict(sorted(views.items(), key=lambda item: -item[1]["total_ms"]["p95"])),
+    }
+
+
+def reset() -> None:
+    with _lock:
+        _timings.clear()
+
+
+def server_timing(timing: dict) -> str:
+    return (
+        f'db;dur={timing["db"]:.1f};desc="{timing["queries"]} queries", '
+        f'tpl;dur={timing["template"]:.1f}, '
+        f'total;dur={timing["total"]:.1f}'
+    )
+
+
+class RequestTimingMiddleware:
+    """Time each request's database work, template rendering and total."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "BLOG_REQUEST_TIMING", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request._template_ms = 0.0
+        started = time.perf_counter()
+        with QueryLog() as log:
+            response = self.get_response(request)
+        return self.finish(request, response, started, log)
+
+    async def __acall__(self, request):
+        request._template_ms = 0.0
+        started = time.perf_counter()
+        log = QueryLog()
+        await sync_to_async(log.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(log.__exit__)(None, None, None)
+        return self.finish(request, response, started, log)
+
+    def finish(self, request, response, started, log):
+        timing = {
+            "total": (time.perf_counter() - started) * 1000,
+            "db": log.duration * 1000,
+            "queries": len(log),
+            "template": request._template_ms,
+        }
+        name = request.resolver_match.view_name if request.resolver_match else "<unresolved>"
+        record(name, timing)
+        self.log(request, response, name, timing)
+        if getattr(settings, "BLOG_SERVER_TIMING", settings.DEBUG) or self.is_staff(request):
+            response.headers["Server-Timing"] = server_timing(timing)
+        return response
+
+    def process_template_response(self, request, response):
+        render_started = time.perf_counter()
+
+        def rendered(response):
+            request._template_ms += (time.perf_counter() - render_started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def is_staff(request) -> bool:
+        # Only look at users the view already loaded: no extra session query.
+        user = getattr(request, "_cached_user", None) or getattr(request, "_acached_user", None)
+        return bool(user and user.is_staff)
+
+    def log(self, request, response, name, timing) -> None:
+        slow = timing["total"] >= getattr(settings, "BLOG_SLOW_REQUEST_MS", 500)
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        entry = {
+            "method": request.method,
+            "path": request.path,
+            "view": name,
+            "status": response.status_code,
+            "total_ms": round(timing["total"], 2),
+            "db_ms": round(timing["db"], 2),
+            "queries": timing["queries"],
+            "template_ms": round(timing["template"], 2),
+        }
+        logger.log(level, json.dumps(entry), extra={"timing": entry})
@@ -1,20 +1,34 @@
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q
-from django.shortcuts import get_object_or_404, redirect
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Case, Count, Exists, Max, OuterRef, Prefetch, Q, Subquery, When
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.functional import cached_property
+from django.views.decorators.cache import never_cache
 from django.views.generic import (
     ListView,
     DetailView,
     CreateView,
     UpdateView,
     DeleteView,
-    TemplateView,
 )
 
-from .forms import PostForm, CommentForm
-from .models import Post, Category, Tag
+from . import timing
+from .conditional import ConditionalGetMixin, page_etag
+from .dbconnections import check_databases
+from .forms import CommentForm, DashboardFilterForm, PostForm
+from .models import Comment, Post, Category, RelatedPost, Tag
+from .pagecache import PageCacheMixin
+from .pagination import CursorPaginator, InvalidCursor
+from .search import is_ranked, search_posts
+from .sidebar import get_sidebar
 
 
 class OwnerOrStaffRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
@@ -23,86 +37,285 @@ class OwnerOrStaffRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
         return self.request.user.is_staff or obj.author == self.request.user
 
 
-class PostListView(ListView):
+class PostListView(PageCacheMixin, ConditionalGetMixin, ListView):
     model = Post
     template_name = "blog/post_list.html"
     context_object_name = "posts"
     paginate_by = 10
 
+    def get_base_queryset(self):
+        return Post.objects.filter(status="published")
+
+    def get_validators(self):
+        updated = self.get_base_queryset().aggregate(updated=Max("updated_at"))["updated"]
+        return page_etag(self.get_cache_dependencies(), updated), updated
+
+    def get_ordering(self):
+        ordering = ["-publish_date", "-pk"]
+        if self.request.GET.get("q") and is_ranked():
+            ordering.insert(0, "-search_rank")
+        return ordering
+
     def get_queryset(self):
-        queryset = Post.objects.filter(
-            status="published",
-            publish_date__lte=timezone.now(),
-        )
+        queryset = self.get_base_queryset()
         query = self.request.GET.get("q")
         if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query)
-                | Q(content__icontains=query)
-                | Q(category__name__icontains=query)
-                | Q(tags__name__icontains=query)
-            ).distinct()
+            queryset = search_posts(queryset, query)
         return (
-            queryset.select_related("author", "category")
+            queryset.defer("content", "content_html", "toc", "body_text")
+            .select_related("author", "category")
             .prefetch_related("tags")
-            .order_by("-publish_date")
+            .order_by(*self.get_ordering())
         )
 
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.get_ordering())
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_cache_dependencies(self) -> list:
+        return ["posts", "sidebar"]
+
+    def load_sidebar(self) -> dict:
+        return get_sidebar()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["categories"] = Category.objects.all()
-        context["tags"] = Tag.objects.all()
+        sidebar = self.load_sidebar()
+        context["categories"] = sidebar["categories"]
+        context["tags"] = sidebar["tags"]
+        context["sidebar_html"] = sidebar["html"]
         context["query"] = self.request.GET.get("q", "")
         return context
 
 
-class PostDetailView(DetailView):
+class PostDetailView(PageCacheMixin, ConditionalGetMixin, DetailView):
     model = Post
     template_name = "blog/post_detail.html"
     context_object_name = "post"
 
+    comments_per_page = 50
+    # Set by make_validators(): the related posts the ETag was computed for.
+    related_ids = None
+
+    def get_comment_page_number(self) -> int:
+        try:
+            number = int(self.request.GET.get("comments", 1))
+        except ValueError:
+            raise Http404("Invalid comment page")
+        if number < 1:
+            raise Http404("Invalid comment page")
+        return number
+
     def get_queryset(self):
         # Allow checking draft posts if use is staff OR the author
-        queryset = Post.objects.all() 
+        queryset = Post.objects.all()
+        # Only the requested page of active comments is fetched, authors included.
+        start = (self.get_comment_page_number() - 1) * self.comments_per_page
+        comments = Comment.objects.filter(active=True).select_related("author")
+        # The page shows the pre-rendered content_html, never the editor's HTML.
+        queryset = queryset.defer("content", "body_text")
         return queryset.select_related("author", "category").prefetch_related(
-            "tags", "comments__author"
+            "tags",
+            Prefetch(
+                "comments",
+                queryset=comments[start : start + self.comments_per_page],
+                to_attr="comment_page",
+            ),
         )
     
+    def get_validator_queryset(self):
+        last_comment = (
+            Comment.objects.filter(post=OuterRef("pk"), active=True)
+            .order_by("-created_at")
+            .values("created_at")[:1]
+        )
+        links = RelatedPost.objects.filter(post=OuterRef("pk"), related__status="published")
+        return (
+            Post.objects.filter(slug=self.kwargs["slug"], status="published")
+            .annotate(last_comment=Subquery(last_comment), has_links=Exists(links))
+            .values("pk", "category_id", "updated_at", "comment_count", "last_comment", "has_links")
+        )
+
+    def get_validators(self):
+        return self.make_validators(self.get_validator_queryset().first())
+
+    def make_validators(self, post):
+        if post is None:
+            # Drafts and missing posts take the normal path (permission check or 404).
+            return None
+        dependencies = [f"post:{post['pk']}"]
+        if post["category_id"]:
+            dependencies.append(f"category:{post['category_id']}")
+        # The related posts are rendered too; their tokens cover title edits.
+        # The page shows these very posts, so ETag and HTML cannot disagree.
+        self.related_ids = self.get_related_ids(post)
+        dependencies += [f"post:{pk}" for pk in self.related_ids]
+        last_modified = max(filter(None, (post["updated_at"], post["last_comment"])))
+        return page_etag(dependencies, *post.values(), self.related_ids), last_modified
+
+    def can_view(self, post, user) -> bool:
+        # Drafts and scheduled posts are visible to staff and their author only.
+        if post.is_published:
+            return True
+        return user.is_authenticated and (user.is_staff or post.author_id == user.pk)
+
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        if obj.status == 'published' and obj.publish_date <= timezone.now():
-            return obj
-        if self.request.user.is_authenticated and (self.request.user.is_staff or obj.author == self.request.user):
-            return obj
-        # Trigger 404 for others
-        from django.http import Http404
-        raise Http404("Post not found")
+        if not self.can_view(obj, self.request.user):
+            raise Http404("Post not found")
+        return obj
+
+    def get_cache_dependencies(self) -> list:
+        dependencies = [f"post:{self.object.pk}"]
+        if self.object.category_id:
+            dependencies.append(f"category:{self.object.category_id}")
+        # The page links to its related posts: it must go when one of them does.
+        dependencies += [f"post:{post.pk}" for post in self.related_posts]
+        return dependencies
+
+    def get_related_querysets(self, limit=3):
+        """The precomputed neighbours, and same-category posts as a fallback.
+
+        Once ``make_validators()`` has picked the related posts, the second
+        queryset is those posts and the first is empty.
+        """
+        if self.related_ids is not None:
+            posts = Post.objects.filter(pk__in=self.related_ids, status="published")
+            if self.related_ids:
+                ranks = [When(pk=pk, then=rank) for rank, pk in enumerate(self.related_ids)]
+                posts = posts.order_by(Case(*ranks))
+            return RelatedPost.objects.none(), posts.defer("content", "content_html", "toc", "body_text")
+        links, fallback = self.related_querysets(self.object.pk, self.object.category_id)
+        return (
+            links.select_related("related").defer(
+                "related__content",
+                "related__content_html",
+                "related__toc",
+                "related__body_text",
+            )[:limit],
+            fallback.defer("content", "content_html", "toc", "body_text")[:limit],
+        )
+
+    def related_querysets(self, post_id, category_id):
+        links = RelatedPost.objects.filter(post=post_id, related__status="published")
+        # Used when not computed yet (new post, or build_related_posts never ran).
+        fallback = (
+            Post.objects.filter(status="published", category=category_id)
+            .exclude(pk=post_id)
+            .order_by("-publish_date")
+        )
+        return links, fallback
+
+    def get_related_ids(self, post, limit=3) -> list:
+        """The pks of the related posts of ``post`` (a validator row), in order."""
+        links, fallback = self.related_querysets(post["pk"], post["category_id"])
+        if post["has_links"]:
+            return list(links.values_list("related_id", flat=True)[:limit])
+        return list(fallback.values_list("pk", flat=True)[:limit])
+
+    def get_related_posts(self):
+        links, fallback = self.get_related_querysets()
+        self.related_posts = [link.related for link in links] or list(fallback)
+        return self.related_posts
+
+    def get_comments_page(self):
+        paginator = Paginator([], self.comments_per_page, allow_empty_first_page=True)
+        # The stored counter saves a COUNT(*) over the comments.
+        paginator.count = self.object.comment_count
+        try:
+            number = paginator.validate_number(self.get_comment_page_number())
+        except InvalidPage:
+            raise Http404("Invalid comment page")
+        return Page(self.object.comment_page, number, paginator)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["comment_form"] = CommentForm()
-        context["comments"] = self.object.comments.filter(active=True)
-        context["related_posts"] = (
-            Post.objects.filter(
-                status="published",
-                publish_date__lte=timezone.now(),
-                category=self.object.category,
-            )
-            .exclude(pk=self.object.pk)
-            .order_by("-publish_date")[:3]
-        )
+        context["comments"] = self.get_comments_page()
+        context["related_posts"] = self.get_related_posts()
         return context
 
 
-class DashboardView(LoginRequiredMixin, TemplateView):
+class DashboardView(LoginRequiredMixin, ListView):
     template_name = "blog/dashboard.html"
+    context_object_name = "posts"
+    paginate_by = 25
+    # Only what the table shows; never the post body.
+    columns = (
+        "title",
+        "slug",
+        "status",
+        "publish_date",
+        "comment_count",
+        "author__username",
+        "category__name",
+    )
+
+    def get(self, request, *args, **kwargs):
+        self.filter_form = DashboardFilterForm(request.GET, user=request.user)
+        self.filters = self.filter_form.cleaned_data if self.filter_form.is_valid() else {}
+        return super().get(request, *args, **kwargs)
+
+    def get_filtered_queryset(self):
+        """Posts matching every filter except the status."""
+        posts = Post.objects.all()
+        if not self.request.user.is_staff:
+            posts = posts.filter(author=self.request.user)
+        if self.filters.get("author"):
+            posts = posts.filter(author=self.filters["author"])
+        if self.filters.get("category"):
+            posts = posts.filter(category=self.filters["category"])
+        # Whole days in the current time zone, as datetime bounds so the
+        # publish_date index stays usable.
+        if self.filters.get("date_from"):
+            start = datetime.combine(self.filters["date_from"], time.min)
+            posts = posts.filter(publish_date__gte=timezone.make_aware(start))
+        if self.filters.get("date_to"):
+            end = datetime.combine(self.filters["date_to"] + timedelta(days=1), time.min)
+            posts = posts.filter(publish_date__lt=timezone.make_aware(end))
+        return posts
+
+    def get_status_counts(self, posts) -> dict:
+        return posts.aggregate(
+            total=Count("pk"),
+            **{
+                status: Count("pk", filter=Q(status=status))
+                for status, _ in Post.STATUS_CHOICES
+            },
+        )
+
+    def get_queryset(self):
+        posts = self.get_filtered_queryset()
+        self.status_counts = self.get_status_counts(posts)
+        status = self.filters.get("status")
+        if status:
+            posts = posts.filter(status=status)
+        return (
+            posts.select_related("author", "category")
+            .only(*self.columns)
+            .order_by(self.filters.get("sort") or "-publish_date", "-pk")
+        )
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        # The status counts already hold the size of every tab; skip the COUNT(*).
+        paginator.count = self.status_counts[self.filters.get("status") or "total"]
+        return paginator
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_staff:
-             context["posts"] = Post.objects.select_related("author", "category").all()
-        else:
-             context["posts"] = Post.objects.select_related("author", "category").filter(author=self.request.user)
+        context["filter_form"] = self.filter_form
+        context["status_tabs"] = [
+            (value, label, self.status_counts[value or "total"])
+            for value, label in DashboardFilterForm.STATUS_CHOICES
+        ]
+        context["current_status"] = self.filters.get("status", "")
+        page = context["page_obj"]
+        context["page_range"] = page.paginator.get_elided_page_range(page.number)
         return context
 
 
@@ -133,22 +346,15 @@ class PostDeleteView(OwnerOrStaffRequiredMixin, DeleteView):
 
 
 class CategoryPostListView(PostListView):
-    def get_queryset(self):
-        self.category = get_object_or_404(Category, slug=self.kwargs["slug"])
-        queryset = Post.objects.filter(
-            status="published",
-            publish_date__lte=timezone.now(),
-            category=self.category,
-        )
-        query = self.request.GET.get("q")
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query)
-                | Q(content__icontains=query)
-                | Q(category__name__icontains=query)
-                | Q(tags__name__icontains=query)
-            ).distinct()
-        return queryset.select_related("author", "category").prefetch_related("tags")
+    @cached_property
+    def category(self):
+        return get_object_or_404(Category, slug=self.kwargs["slug"])
+
+    def get_base_queryset(self):
+        return super().get_base_queryset().filter(category=self.category)
+
+    def get_cache_dependencies(self) -> list:
+        return [f"category:{self.category.pk}", "sidebar"]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -157,22 +363,15 @@ class CategoryPostListView(PostListView):
 
 
 class TagPostListView(PostListView):
-    def get_queryset(self):
-        self.tag = get_object_or_404(Tag, slug=self.kwargs["slug"])
-        queryset = Post.objects.filter(
-            status="published",
-            publish_date__lte=timezone.now(),
-            tags=self.tag,
-        )
-        query = self.request.GET.get("q")
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query)
-                | Q(content__icontains=query)
-                | Q(category__name__icontains=query)
-                | Q(tags__name__icontains=query)
-            ).distinct()
-        return queryset.select_related("author", "category").prefetch_related("tags")
+    @cached_property
+    def tag(self):
+        return get_object_or_404(Tag, slug=self.kwargs["slug"])
+
+    def get_base_queryset(self):
+        return super().get_base_queryset().filter(tags=self.tag)
+
+    def get_cache_dependencies(self) -> list:
+        return [f"tag:{self.tag.pk}", "sidebar"]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -180,6 +379,81 @@ class TagPostListView(PostListView):
         return context
 
 
+# Async variants of the public read views, routed when BLOG_ASYNC_VIEWS is on
+# (the default under ASGI; see blogmota/asgi.py). They run every query up front
+# through the async ORM, so a worker can overlap many requests' database waits,
+# then reuse the sync views' context building on the fetched rows.
+
+
+class AsyncPostListView(PostListView):
+    async def aget_base_queryset(self):
+        """Fetch what ``get_base_queryset()`` needs (e.g. the category) first."""
+        return self.get_base_queryset()
+
+    async def aget_validators(self):
+        queryset = await self.aget_base_queryset()
+        updated = (await queryset.aaggregate(updated=Max("updated_at")))["updated"]
+        etag = await sync_to_async(page_etag)(self.get_cache_dependencies(), updated)
+        return etag, updated
+
+    async def apaginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.get_ordering())
+        try:
+            page = await paginator.apage(self.request.GET.get("cursor"))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def get(self, request, *args, **kwargs):
+        await self.aget_base_queryset()
+        self.object_list = self.get_queryset()
+        self.pagination = await self.apaginate_queryset(self.object_list, self.paginate_by)
+        self.sidebar = await sync_to_async(get_sidebar)()
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.pagination
+
+    def load_sidebar(self) -> dict:
+        return self.sidebar
+
+
+class AsyncCategoryPostListView(AsyncPostListView, CategoryPostListView):
+    async def aget_base_queryset(self):
+        if "category" not in self.__dict__:
+            self.category = await aget_object_or_404(Category, slug=self.kwargs["slug"])
+        return self.get_base_queryset()
+
+
+class AsyncTagPostListView(AsyncPostListView, TagPostListView):
+    async def aget_base_queryset(self):
+        if "tag" not in self.__dict__:
+            self.tag = await aget_object_or_404(Tag, slug=self.kwargs["slug"])
+        return self.get_base_queryset()
+
+
+class AsyncPostDetailView(PostDetailView):
+    async def aget_validators(self):
+        post = await self.get_validator_queryset().afirst()
+        return await sync_to_async(self.make_validators)(post)
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.object = await self.get_queryset().aget(slug=self.kwargs[self.slug_url_kwarg])
+        except Post.DoesNotExist:
+            raise Http404("Post not found")
+        if not self.can_view(self.object, await request.auser()):
+            raise Http404("Post not found")
+        links, fallback = self.get_related_querysets()
+        self.related_posts = [link.related async for link in links] or [
+            post async for post in fallback
+        ]
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_related_posts(self):
+        return self.related_posts
+
+
 @login_required
 def add_comment(request, slug):
     post = get_object_or_404(Post, slug=slug)
@@ -191,3 +465,19 @@ def add_comment(request, slug):
             comment.author = request.user
             comment.save()
     return redirect(post.get_absolute_url())
+
+
+@never_cache
+def health(request):
+    """Load balancer check: 200 if every database answers, 503 otherwise."""
+    ok, databases = check_databases()
+    return JsonResponse(
+        {"status": "ok" if ok else "unavailable", "databases": databases},
+        status=200 if ok else 503,
+    )
+
+
+@staff_member_required
+def timings(request):
+    """Latency percentiles per URL name recorded by this process (see blog.timing)."""
+    return JsonResponse(timing.summary())
@@ -1,9 +1,20 @@
-"""ASGI config for blogmota project."""
+"""ASGI config for blogmota project.
+
+Serve with ``gunicorn blogmota.asgi:application -k uvicorn_worker.UvicornWorker``.
+"""
 
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "blogmota.settings")
+# Route the public pages to their async views (see blog.urls).
+os.environ.setdefault("BLOG_ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
+
+# Parse the templates now rather than during this worker's first requests
+# (needs the app registry that the line above sets up).
+from blog.templating import warm_templates  # noqa: E402
+
+warm_templates()
@@ -23,6 +23,11 @@ if not DEBUG:
     SECURE_HSTS_SECONDS = 31536000  # 1 year
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_HSTS_PRELOAD = True
+    # Load balancer health checks arrive over plain HTTP.
+    SECURE_REDIRECT_EXEMPT = [r"^healthz/$"]
+    # TLS ends at Render's proxy, which says so in X-Forwarded-Proto; without
+    # this SECURE_SSL_REDIRECT would redirect every request to itself.
+    SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 ALLOWED_HOSTS = [".railway.app"]
 RENDER_EXTERNAL_HOSTNAME = os.environ.get("RENDER_EXTERNAL_HOSTNAME")
@@ -47,23 +52,39 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # Added Whitenoise
+    # WhiteNoise, async-capable; see blog.staticassets.
+    "blog.staticassets.StaticFilesMiddleware",
+    "blog.timing.RequestTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "blog.profiling.SamplingProfilerMiddleware",
+    "blog.querylog.QueryLogMiddleware",
 ]
 
 ROOT_URLCONF = "blogmota.urls"
 
+# Templates are parsed once per process by the cached loader and compiled when a
+# worker boots (blog.templating.warm_templates, called from wsgi.py and asgi.py).
+# BLOG_CACHED_TEMPLATES=False re-reads and re-parses them on every render, which
+# is only useful to measure the difference with `manage.py benchmark`.
+BLOG_CACHED_TEMPLATES = os.environ.get("BLOG_CACHED_TEMPLATES", "True") == "True"
+template_loaders = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+if BLOG_CACHED_TEMPLATES:
+    template_loaders = [("django.template.loaders.cached.Loader", template_loaders)]
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
+            "loaders": template_loaders,
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -84,9 +105,108 @@ DATABASES = {
     "default": dj_database_url.config(
         default=os.environ.get("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
         conn_max_age=600,
+        conn_health_checks=True,
     )
 }
 
+# Connection management; blog.dbconnections reports how well connections are
+# reused. On PostgreSQL each process keeps a psycopg pool of at most
+# DATABASE_POOL_SIZE connections (0 falls back to one persistent connection per
+# thread); CONN_HEALTH_CHECKS makes the pool test a connection before handing
+# it out. SQLite runs in WAL mode so readers never wait for a writer, and write
+# transactions take their lock up front instead of failing with "database is
+# locked" halfway through.
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 4))
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql" and DATABASE_POOL_SIZE:
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": 1,
+        "max_size": DATABASE_POOL_SIZE,
+        "timeout": 10,
+    }
+elif DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"].setdefault("OPTIONS", {}).update(
+        {
+            "init_command": (
+                "PRAGMA journal_mode = WAL;"
+                "PRAGMA synchronous = NORMAL;"
+                "PRAGMA busy_timeout = 5000;"
+                "PRAGMA cache_size = -20000;"
+                "PRAGMA temp_store = MEMORY;"
+                "PRAGMA mmap_size = 134217728;"
+            ),
+            "transaction_mode": "IMMEDIATE",
+        }
+    )
+
+# Cache
+# LocMemCache is per-process: a purge only reaches the process that made it.
+# With several gunicorn workers, or a run_worker process, point CACHE_BACKEND at
+# a shared backend so invalidations reach every process. render.yaml uses
+# django.core.cache.backends.db.DatabaseCache (CACHE_LOCATION is the table,
+# created by `manage.py createcachetable`); RedisCache works too.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "blogmota"),
+    },
+    # {% cache ... using="templates" %} fragments of base.html: markup that
+    # only changes with a deploy, so each process keeps its own copy.
+    "templates": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "blogmota-templates",
+    },
+}
+
+BLOG_SIDEBAR_CACHE_TIMEOUT = int(os.environ.get("BLOG_SIDEBAR_CACHE_TIMEOUT", 60 * 60))
+# Anonymous full-page cache; set to 0 to disable. Off by default when several
+# web processes would each keep a LocMemCache copy that other processes' purges
+# never reach.
+_PER_PROCESS_CACHE = CACHES["default"]["BACKEND"].endswith(".LocMemCache")
+_PAGE_CACHE_DEFAULT = 0 if _PER_PROCESS_CACHE and int(os.environ.get("WEB_CONCURRENCY", 1)) > 1 else 60 * 10
+BLOG_PAGE_CACHE_TIMEOUT = int(os.environ.get("BLOG_PAGE_CACHE_TIMEOUT", _PAGE_CACHE_DEFAULT))
+# Identifies the deployed code. Cached pages and ETags include it, so a deploy
+# that changes templates is never answered with the old HTML or a 304. Render
+# sets RENDER_GIT_COMMIT for every build.
+BLOG_BUILD_ID = os.environ.get("BLOG_BUILD_ID", os.environ.get("RENDER_GIT_COMMIT", ""))
+
+# Background tasks (blog.queue). Without eager mode `run_worker` processes
+# must be running; eager mode runs tasks in-process after each commit, in the
+# request, so keep it for development. Image tasks write to MEDIA_ROOT and sit
+# on their own "media" queue, which start.sh consumes on the web service.
+BLOG_TASKS_EAGER = os.environ.get("BLOG_TASKS_EAGER", str(DEBUG)) == "True"
+
+# Log the query count of every request and warn about repeated (N+1) query
+# shapes; see blog.querylog.
+BLOG_QUERY_LOG = os.environ.get("BLOG_QUERY_LOG", str(DEBUG)) == "True"
+
+# Time every request (blog.timing): Server-Timing headers for staff, or for
+# everyone with BLOG_SERVER_TIMING, JSON log lines on the blog.timing logger
+# (WARNING for requests slower than BLOG_SLOW_REQUEST_MS) and per-view
+# percentiles at /dashboard/timings/.
+BLOG_REQUEST_TIMING = os.environ.get("BLOG_REQUEST_TIMING", "True") == "True"
+BLOG_SERVER_TIMING = os.environ.get("BLOG_SERVER_TIMING", str(DEBUG)) == "True"
+BLOG_SLOW_REQUEST_MS = int(os.environ.get("BLOG_SLOW_REQUEST_MS", 500))
+
+# Sampling profiler (blog.profiling): staff add ?_profile=1 or an X-Profile: 1
+# header to profile one request, BLOG_PROFILE_SAMPLE_RATE profiles that fraction
+# of all requests. Folded stacks are written to BLOG_PROFILE_DIR/<url name>/;
+# an empty BLOG_PROFILE_DIR turns the profiler off.
+BLOG_PROFILE_DIR = os.environ.get("BLOG_PROFILE_DIR", str(BASE_DIR / "profiles"))
+BLOG_PROFILE_SAMPLE_RATE = float(os.environ.get("BLOG_PROFILE_SAMPLE_RATE", 0))
+BLOG_PROFILE_INTERVAL_MS = float(os.environ.get("BLOG_PROFILE_INTERVAL_MS", 5))
+
+# Async versions of the public read views (blog.views.Async*); blogmota/asgi.py
+# turns them on. Under ASGI each request's queries run in a thread of their own,
+# so persistent connections would pile up: close them after every request (with
+# the PostgreSQL pool that just returns them to the pool).
+BLOG_ASYNC_VIEWS = os.environ.get("BLOG_ASYNC_VIEWS", "False") == "True"
+if BLOG_ASYNC_VIEWS:
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -119,9 +239,26 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
-# Whitenoise storage for static files
-if not DEBUG:
-    STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# collectstatic skips the CKEditor files the editor never loads, minifies our
+# CSS and writes hashed, gzip/Brotli-compressed copies that WhiteNoise serves
+# with far-future cache headers; see blog.staticassets.
+# BLOG_STATIC_PIPELINE needs a collectstatic run before pages render, and the
+# hashed names are only linked with DEBUG off; render.yaml sets both.
+BLOG_STATIC_PIPELINE = os.environ.get("BLOG_STATIC_PIPELINE", str(not DEBUG)) == "True"
+STATICFILES_FINDERS = [
+    "django.contrib.staticfiles.finders.FileSystemFinder",
+    "blog.staticassets.PrunedAppDirectoriesFinder",
+]
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "blog.staticassets.StaticAssetStorage"
+            if BLOG_STATIC_PIPELINE
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
@@ -146,6 +283,16 @@ LOGGING = {
         "level": "WARNING",
     },
     "loggers": {
+        "blog.querylog": {
+            "handlers": ["console"],
+            "level": os.getenv("BLOG_QUERY_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+        "blog.timing": {
+            "handlers": ["console"],
+            "level": os.getenv("BLOG_TIMING_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
         "django": {
             "handlers": ["console"],
             "level": os.getenv("DJANGO_LOG_LEVEL", "INFO"),
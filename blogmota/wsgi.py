@@ -7,3 +7,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "blogmota.settings")
 
 application = get_wsgi_application()
+
+# Parse the templates now rather than during this worker's first requests
+# (needs the app registry that the line above sets up).
+from blog.templating import warm_templates  # noqa: E402
+
+warm_templates()
@@ -1,2 +1,5 @@
 #!/bin/sh
-python manage.py collectstatic --noinput
+# --clear drops files a previous build collected but this one prunes.
+python manage.py collectstatic --noinput --clear
+# The shared page cache table (CACHE_BACKEND in render.yaml); a no-op once it exists.
+python manage.py createcachetable
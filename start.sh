@@ -0,0 +1,9 @@
+#!/bin/sh
+# Image derivatives are written to MEDIA_ROOT, on this service's own disk: the
+# worker service cannot see it, so this service runs the "media" task queue
+# itself, next to gunicorn and outside its request threads.
+while true; do
+    python manage.py run_worker --queue media
+    sleep 5
+done &
+exec gunicorn blogmota.wsgi:application